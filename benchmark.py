@@ -0,0 +1,860 @@
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import aiohttp
+import discord
+import yarl
+from aiohttp import web
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+
+parser = argparse.ArgumentParser(description="Benchmark jambot handlers against a fake guild, MongoDB and GitHub")
+parser.add_argument("--sizes", default="10,100,1000,5000", help="Comma-separated team counts")
+parser.add_argument("--members-per-team", type=int, default=4)
+parser.add_argument("--late-commits", type=int, default=3, help="Commits after the deadline in each fake repo")
+parser.add_argument("--discord-latency", type=float, default=0.005, help="Seconds per fake Discord API call")
+parser.add_argument("--bucket", action="append", default=[], metavar="NAME=LIMIT/SECONDS",
+                    help="Rate-limit bucket, e.g. global=50/1 or channels=10/10 (repeatable)")
+parser.add_argument("--github-latency", type=float, default=0.02, help="Seconds per fake GitHub request")
+parser.add_argument("--github-quota", type=int, default=5000, help="X-RateLimit-Limit reported by the fake GitHub")
+parser.add_argument("--mongo-latency", type=float, default=0.001, help="Seconds per round trip to the in-memory MongoDB")
+parser.add_argument("--mongouri", default=None, help="Use a real MongoDB instead of the in-memory one")
+parser.add_argument("--database", default="jambot_bench", help="Database to use (and drop) with --mongouri")
+parser.add_argument("--output", default="benchmark_results.json")
+parser.add_argument("--compare", default=None, help="Earlier results file to compare wall times against")
+parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, but no peak memory)")
+parser.add_argument("--verbose", action="store_true", help="Show the handlers' own output")
+args = parser.parse_args()
+
+BUCKET_NAMES = ("global", "channels", "roles", "member_roles", "permissions", "channel_edit", "messages", "interactions")
+buckets = {}
+for spec in args.bucket:
+    try:
+        name, rate = spec.split("=", 1)
+        calls, seconds = rate.split("/", 1)
+        buckets[name] = (int(calls), float(seconds))
+    except ValueError:
+        parser.error(f"--bucket must look like NAME=LIMIT/SECONDS, got {spec!r}")
+    if name not in BUCKET_NAMES:
+        parser.error(f"Unknown bucket {name!r}, use one of: {', '.join(BUCKET_NAMES)}")
+
+SERVER_ID = 100000000000000001
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+output_path = os.path.abspath(args.output)
+compare_path = os.path.abspath(args.compare) if args.compare else None
+
+os.environ.update({
+    "token": "benchmark",
+    "serverid": str(SERVER_ID),
+    "mongouri": args.mongouri or "mongodb://127.0.0.1:1/benchmark",
+    "PAT": "benchmark",
+    "config_backend": "file",
+})
+workdir = tempfile.TemporaryDirectory(prefix="jambot-bench-")
+os.chdir(workdir.name)
+sys.path.insert(0, repo_dir)
+
+import bot as jambot
+
+metrics = jambot.metrics
+
+class Bucket:
+    def __init__(self, limit: int, per: float):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def take(self):
+        now = time.monotonic()
+        if now >= self.reset_at:
+            self.reset_at = now + self.per
+            self.remaining = self.limit
+        if self.remaining > 0:
+            self.remaining -= 1
+            return 0.0
+        return self.reset_at - now
+
+class FakeDiscord:
+    def __init__(self, latency: float, bucket_specs: dict):
+        self.latency = latency
+        self.buckets = {name: Bucket(limit, per) for name, (limit, per) in bucket_specs.items()}
+        self.next_id = SERVER_ID + 1
+
+    def snowflake(self):
+        self.next_id += 1
+        return self.next_id
+
+    async def request(self, method: str, path: str, bucket: str, **params):
+        return await jambot.timed_discord_request(discord.http.Route(method, path, **params), bucket=bucket)
+
+    async def send(self, route: discord.http.Route, *, bucket: str):
+        # discord.py reads X-RateLimit-Remaining and sleeps before sending, so per-route
+        # buckets only show up as bucket wait. The global limit has no headers and gets 429s.
+        if bucket in self.buckets:
+            while (wait := self.buckets[bucket].take()) > 0:
+                await asyncio.sleep(wait)
+        while "global" in self.buckets and (wait := self.buckets["global"].take()) > 0:
+            await self.respond(route, 429, {"Retry-After": f"{wait:.3f}"})
+            await asyncio.sleep(wait)
+        await self.respond(route, 200, {})
+
+    async def respond(self, route: discord.http.Route, status: int, headers: dict):
+        ctx = SimpleNamespace()
+        params = SimpleNamespace(method=route.method, url=yarl.URL(route.url), headers={})
+        await jambot.on_discord_request_start(None, ctx, params)
+        await asyncio.sleep(self.latency)
+        params.response = SimpleNamespace(status=status, headers=headers)
+        await jambot.on_discord_request_end(None, ctx, params)
+
+class FakeRole:
+    def __init__(self, guild, role_id: int, name: str, default: bool = False):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+        self.default = default
+
+    def is_default(self):
+        return self.default
+
+    @property
+    def mention(self):
+        return f"<@&{self.id}>"
+
+class FakeMember:
+    def __init__(self, guild, member_id: int, name: str):
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.roles = [guild.default_role]
+        self.guild_permissions = SimpleNamespace(administrator=True)
+
+    def get_role(self, role_id: int):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+    async def add_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.guild.api.request("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", "member_roles",
+                                         guild_id=self.guild.id, user_id=self.id, role_id=role.id)
+            self.roles.append(role)
+
+    @property
+    def mention(self):
+        return f"<@{self.id}>"
+
+class FakeMessage:
+    def __init__(self, api: FakeDiscord, content=None, embed=None, channel=None, interaction=None):
+        self.api = api
+        self.id = api.snowflake()
+        self.content = content
+        self.embed = embed
+        self.channel = channel
+        self.interaction = interaction
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        if self.interaction:
+            await self.api.request("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", "interactions",
+                                   webhook_id=self.interaction.application_id, webhook_token=self.interaction.token, message_id=self.id)
+        else:
+            await self.api.request("PATCH", "/channels/{channel_id}/messages/{message_id}", "messages",
+                                   channel_id=self.channel.id, message_id=self.id)
+        self.content = content if content is not None else self.content
+        self.embed = embed or self.embed
+        return self
+
+class FakeChannel:
+    def __init__(self, guild, name: str, kind: str, category, overwrites: dict | None):
+        self.guild = guild
+        self.id = guild.api.snowflake()
+        self.name = name
+        self.kind = kind
+        self.category = category
+        self.overwrites = dict(overwrites or {})
+
+    async def set_permissions(self, target, *, overwrite=None, reason=None):
+        await self.guild.api.request("PUT", "/channels/{channel_id}/permissions/{target_id}", "permissions",
+                                     channel_id=self.id, target_id=target.id)
+        if overwrite is None:
+            self.overwrites.pop(target, None)
+        else:
+            self.overwrites[target] = overwrite
+
+    async def edit(self, *, overwrites=None, reason=None, **kwargs):
+        await self.guild.api.request("PATCH", "/channels/{channel_id}", "channel_edit", channel_id=self.id)
+        if overwrites is not None:
+            self.overwrites = dict(overwrites)
+        return self
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        await self.guild.api.request("POST", "/channels/{channel_id}/messages", "messages", channel_id=self.id)
+        return FakeMessage(self.guild.api, content, embed, channel=self)
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+class FakeCategory:
+    def __init__(self, guild, name: str):
+        self.guild = guild
+        self.id = guild.api.snowflake()
+        self.name = name
+        self.text_channels = []
+        self.voice_channels = []
+
+class FakeGuild:
+    def __init__(self, api: FakeDiscord):
+        self.api = api
+        self.id = SERVER_ID
+        self.name = "Benchmark"
+        self.default_role = FakeRole(self, SERVER_ID, "@everyone", default=True)
+        self.roles = [self.default_role]
+        self._members: dict[int, FakeMember] = {}
+        self.categories = []
+        self.text_channels = []
+        self.voice_channels = []
+        self.me = self.add_member(api.snowflake(), "jambot")
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def add_member(self, member_id: int, name: str):
+        member = FakeMember(self, member_id, name)
+        self._members[member_id] = member
+        return member
+
+    def add_role(self, name: str):
+        role = FakeRole(self, self.api.snowflake(), name)
+        self.roles.append(role)
+        return role
+
+    def get_member(self, member_id: int):
+        return self._members.get(member_id)
+
+    async def create_role(self, *, name: str, color=None, mentionable=False, reason=None):
+        await self.api.request("POST", "/guilds/{guild_id}/roles", "roles", guild_id=self.id)
+        return self.add_role(name)
+
+    async def create_category(self, name: str, **kwargs):
+        await self.api.request("POST", "/guilds/{guild_id}/channels", "channels", guild_id=self.id)
+        category = FakeCategory(self, name)
+        self.categories.append(category)
+        return category
+
+    async def create_channel(self, kind: str, name: str, category=None, overwrites=None):
+        await self.api.request("POST", "/guilds/{guild_id}/channels", "channels", guild_id=self.id)
+        channel = FakeChannel(self, name, kind, category, overwrites)
+        (self.text_channels if kind == "text" else self.voice_channels).append(channel)
+        if category:
+            (category.text_channels if kind == "text" else category.voice_channels).append(channel)
+        return channel
+
+    async def create_text_channel(self, name: str, *, category=None, overwrites=None, reason=None, **kwargs):
+        return await self.create_channel("text", name, category, overwrites)
+
+    async def create_voice_channel(self, name: str, *, category=None, overwrites=None, reason=None, **kwargs):
+        return await self.create_channel("voice", name, category, overwrites)
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def callback(self):
+        await self.interaction.guild.api.request("POST", "/interactions/{interaction_id}/{interaction_token}/callback", "interactions",
+                                                 interaction_id=self.interaction.id, interaction_token=self.interaction.token)
+        self.done = True
+
+    async def defer(self, **kwargs):
+        await self.callback()
+
+    async def send_message(self, content=None, *, embed=None, **kwargs):
+        await self.callback()
+        self.interaction.outputs.append(content or embed)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, *, embed=None, wait=False, **kwargs):
+        api = self.interaction.guild.api
+        await api.request("POST", "/webhooks/{webhook_id}/{webhook_token}", "interactions",
+                          webhook_id=self.interaction.application_id, webhook_token=self.interaction.token)
+        self.interaction.outputs.append(content or embed)
+        return FakeMessage(api, content, embed, interaction=self.interaction)
+
+class FakeInteraction:
+    def __init__(self, guild: FakeGuild, user: FakeMember):
+        self.id = guild.api.snowflake()
+        self.application_id = SERVER_ID
+        self.token = "aW50ZXJhY3Rpb246" + hashlib.sha1(str(self.id).encode()).hexdigest()
+        self.guild = guild
+        self.user = user
+        self.command = None
+        self.extras = {}
+        self.outputs = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, content=None, *, embed=None, **kwargs):
+        await self.guild.api.request("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/@original", "interactions",
+                                     webhook_id=self.application_id, webhook_token=self.token)
+        self.outputs.append(content or embed)
+
+    def last_output(self):
+        if not self.outputs:
+            return None
+        output = self.outputs[-1]
+        if isinstance(output, discord.Embed):
+            output = f"{output.title}: {output.description}"
+        return output[:300]
+
+def matches(doc: dict, query: dict):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$gt" and (value is None or not value > operand):
+                    return False
+                if op == "$gte" and (value is None or not value >= operand):
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+def prepare(query: dict):
+    prepared = {}
+    for field, condition in query.items():
+        if isinstance(condition, dict) and isinstance(condition.get("$in"), list):
+            try:
+                condition = {**condition, "$in": set(condition["$in"])}
+            except TypeError:
+                pass
+        prepared[field] = condition
+    return prepared
+
+def project(doc: dict, projection: dict | None):
+    if not projection:
+        return dict(doc)
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        result = {field: doc[field] for field in included if field in doc}
+    else:
+        result = {field: value for field, value in doc.items() if projection.get(field, 1)}
+    if projection.get("_id", 1) and "_id" in doc:
+        result["_id"] = doc["_id"]
+    else:
+        result.pop("_id", None)
+    return result
+
+class MemoryCursor:
+    def __init__(self, collection, command: str, produce):
+        self.collection = collection
+        self.command = command
+        self.produce = produce
+        self.size = 101
+
+    def batch_size(self, size: int):
+        self.size = size
+        return self
+
+    async def __aiter__(self):
+        docs = self.produce()
+        await self.collection.database.round_trip(self.command)
+        for i, doc in enumerate(docs):
+            if i and i % self.size == 0:
+                await self.collection.database.round_trip("getMore")
+            yield doc
+
+class MemoryCollection:
+    def __init__(self, database, name: str, key: tuple[str, ...]):
+        self.database = database
+        self.name = name
+        self.key = key
+        self.docs: dict[tuple, dict] = {}
+
+    def lookup(self, query: dict):
+        if set(query) == set(self.key) and not any(isinstance(query[field], dict) for field in self.key):
+            doc = self.docs.get(tuple(query[field] for field in self.key))
+            return [doc] if doc else []
+        query = prepare(query)
+        return [doc for doc in self.docs.values() if matches(doc, query)]
+
+    def insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        self.docs[tuple(doc.get(field) for field in self.key)] = doc
+
+    def update(self, query: dict, update: dict, upsert: bool):
+        found = self.lookup(query)
+        inserting = not found and upsert
+        if inserting:
+            doc = {field: value for field, value in query.items() if not isinstance(value, dict)}
+            found = [doc]
+        for doc in found[:1]:
+            doc.update(update.get("$set", {}))
+            if inserting:
+                doc.update(update.get("$setOnInsert", {}))
+            for field, value in update.get("$addToSet", {}).items():
+                values = doc.setdefault(field, [])
+                existing = set(values)
+                for item in value["$each"] if isinstance(value, dict) else [value]:
+                    if item not in existing:
+                        existing.add(item)
+                        values.append(item)
+            if inserting:
+                self.insert(doc)
+        return len(found[:1]) and not inserting, inserting
+
+    def delete(self, query: dict, many: bool):
+        found = self.lookup(query)
+        for doc in found if many else found[:1]:
+            del self.docs[tuple(doc.get(field) for field in self.key)]
+        return len(found) if many else len(found[:1])
+
+    def find(self, query: dict | None = None, projection: dict | None = None):
+        return MemoryCursor(self, "find", lambda: [project(doc, projection) for doc in self.lookup(query or {})])
+
+    async def find_one(self, query: dict | None = None, projection: dict | None = None):
+        await self.database.round_trip("find")
+        found = self.lookup(query or {})
+        return project(found[0], projection) if found else None
+
+    async def insert_many(self, docs: list[dict], **kwargs):
+        await self.database.round_trip("insert")
+        for doc in docs:
+            self.insert(dict(doc))
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self.database.round_trip("update")
+        matched, _ = self.update(query, update, upsert)
+        return SimpleNamespace(matched_count=int(matched), modified_count=int(matched))
+
+    async def delete_one(self, query: dict):
+        await self.database.round_trip("delete")
+        return SimpleNamespace(deleted_count=self.delete(query, many=False))
+
+    async def delete_many(self, query: dict):
+        await self.database.round_trip("delete")
+        return SimpleNamespace(deleted_count=self.delete(query, many=True))
+
+    async def bulk_write(self, operations: list, ordered: bool = True):
+        await self.database.round_trip("update")
+        for operation in operations:
+            if isinstance(operation, UpdateOne):
+                self.update(operation._filter, operation._doc, operation._upsert)
+            elif isinstance(operation, DeleteOne):
+                self.delete(operation._filter, many=False)
+
+    def aggregate(self, pipeline: list[dict]):
+        def produce():
+            docs = list(self.docs.values())
+            for stage in pipeline:
+                if "$match" in stage:
+                    query = prepare(stage["$match"])
+                    docs = [doc for doc in docs if matches(doc, query)]
+                elif "$group" in stage:
+                    spec = dict(stage["$group"])
+                    group_key = spec.pop("_id")
+                    groups: dict = {}
+                    for doc in docs:
+                        key = doc.get(group_key[1:]) if isinstance(group_key, str) and group_key.startswith("$") else group_key
+                        row = groups.setdefault(key, {"_id": key, **{field: 0 for field in spec}})
+                        for field, accumulator in spec.items():
+                            operand = accumulator["$sum"]
+                            row[field] += doc.get(operand[1:], 0) if isinstance(operand, str) else operand
+                    docs = list(groups.values())
+            return docs
+        return MemoryCursor(self, "aggregate", produce)
+
+    async def create_index(self, keys, **kwargs):
+        await self.database.round_trip("createIndexes")
+
+class MemoryDatabase:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.roles = MemoryCollection(self, "roles", ("name",))
+        self.team_members = MemoryCollection(self, "team_members", ("team_name", "discord_id"))
+        self.commits = MemoryCollection(self, "commits", ("team", "sha"))
+        self.setup_checkpoints = MemoryCollection(self, "setup_checkpoints", ("_id",))
+
+    async def round_trip(self, command: str):
+        started_at = time.perf_counter()
+        await asyncio.sleep(self.latency)
+        metrics.observe("jambot_mongo_command_seconds", time.perf_counter() - started_at, command=command)
+
+class FakeGitHub:
+    def __init__(self, latency: float, late_commits: int, quota: int):
+        self.latency = latency
+        self.late_commits = late_commits
+        self.quota = quota
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.used = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}"
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+            self.used = 0
+
+    def record(self, kind: str, billable: bool):
+        with self.lock:
+            self.counts[kind] += 1
+            if billable:
+                self.used += 1
+            return max(self.quota - self.used, 0)
+
+    def commits_for(self, full_name: str, since: datetime | None):
+        commits = []
+        for k in range(self.late_commits - 1, -1, -1):
+            committed_at = jambot.limit + timedelta(minutes=k + 1)
+            if since and committed_at < since:
+                continue
+            commits.append({
+                "sha": hashlib.sha1(f"{full_name}:{k}".encode()).hexdigest(),
+                "message": f"Commit {k} to {full_name}",
+                "date": committed_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            })
+        return commits
+
+    async def handle_commits(self, request: web.Request):
+        await asyncio.sleep(self.latency)
+        full_name = f"{request.match_info['owner']}/{request.match_info['repo']}"
+        per_page = int(request.query.get("per_page", "30"))
+        page = int(request.query.get("page", "1"))
+        since = request.query.get("since")
+        commits = self.commits_for(full_name, datetime.fromisoformat(since.replace("Z", "+00:00")) if since else None)
+        etag = 'W/"' + hashlib.sha1(f"{full_name}:{since}:{per_page}:{page}:{len(commits)}".encode()).hexdigest() + '"'
+
+        headers = {"ETag": etag, "X-RateLimit-Limit": str(self.quota), "X-RateLimit-Resource": "core", "X-RateLimit-Reset": str(int(time.time()) + 3600)}
+        if request.headers.get("If-None-Match") == etag:
+            headers["X-RateLimit-Remaining"] = str(self.record("rest_304", billable=False))
+            return web.Response(status=304, headers=headers)
+        headers["X-RateLimit-Remaining"] = str(self.record("rest_200", billable=True))
+
+        chunk = commits[(page - 1) * per_page:page * per_page]
+        if page * per_page < len(commits):
+            next_url = request.url.with_query({**request.query, "page": str(page + 1)})
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        payload = [{"sha": c["sha"], "commit": {"message": c["message"], "committer": {"date": c["date"]}}} for c in chunk]
+        return web.json_response(payload, headers=headers)
+
+    async def handle_graphql(self, request: web.Request):
+        await asyncio.sleep(self.latency)
+        variables = (await request.json())["variables"]
+        since = datetime.fromisoformat(variables["since"].replace("Z", "+00:00"))
+        data = {}
+        i = 0
+        while f"o{i}" in variables:
+            commits = self.commits_for(f"{variables[f'o{i}']}/{variables[f'n{i}']}", since)
+            data[f"r{i}"] = {"defaultBranchRef": {"target": {"history": {
+                "pageInfo": {"hasNextPage": len(commits) > 100},
+                "nodes": [{"oid": c["sha"], "committedDate": c["date"], "message": c["message"]} for c in commits[:100]],
+            }}}}
+            i += 1
+        self.record("graphql", billable=True)
+        return web.json_response({"data": data})
+
+    def start(self):
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.serve, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def serve(self, ready: threading.Event):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        app.router.add_get("/repos/{owner}/{repo}/commits", self.handle_commits)
+        app.router.add_post("/graphql", self.handle_graphql)
+        self.runner = web.AppRunner(app, access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        self.loop.run_until_complete(web.SockSite(self.runner, self.sock).start())
+        ready.set()
+        self.loop.run_forever()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+def team_name(i: int):
+    return f"team-{i:05d}"
+
+def member_id(team: int, slot: int):
+    return 300000000000000000 + team * 100 + slot
+
+async def build_world(teams: int, github_server: FakeGitHub):
+    if args.mongouri:
+        await jambot.mongo_client.drop_database(args.database)
+        database = jambot.mongo_client[args.database]
+    else:
+        database = MemoryDatabase(args.mongo_latency)
+    jambot.roles_collection = database.roles
+    jambot.team_members_collection = database.team_members
+    jambot.commits_collection = database.commits
+    jambot.setup_checkpoints_collection = database.setup_checkpoints
+    for collection, keys, options in (
+        (database.roles, [("name", 1)], {"unique": True}),
+        (database.team_members, [("team_name", 1), ("discord_id", 1)], {"unique": True}),
+        (database.commits, [("team", 1), ("sha", 1)], {"unique": True}),
+        (database.commits, [("team", 1), ("committed_at", -1)], {}),
+    ):
+        await collection.create_index(keys, **options)
+
+    await database.roles.insert_many([
+        {"name": team_name(i), "githubRepo": f"https://github.com/bench-org/{team_name(i)}", "githubUsernames": [], "status": "active"}
+        for i in range(teams)
+    ])
+    members = [
+        {"team_name": team_name(i), "discord_id": str(member_id(i, slot)), "name": f"member-{i}-{slot}"}
+        for i in range(teams) for slot in range(args.members_per_team)
+    ]
+    if members:
+        await database.team_members.insert_many(members)
+
+    jambot.team_registry.collection = database.roles
+    await jambot.team_registry.load()
+
+    guild = FakeGuild(FakeDiscord(args.discord_latency, buckets))
+    jambot.discord_http_request = guild.api.send
+    guild.add_role("CT25")
+    for i in range(teams):
+        for slot in range(args.members_per_team):
+            guild.add_member(member_id(i, slot), f"member-{i}-{slot}")
+    admin = guild.add_member(guild.api.snowflake(), "organizer")
+    jambot.bot.get_guild = lambda guild_id: guild if guild_id == SERVER_ID else None
+
+    jambot.config_store.data["enabled"] = True
+    jambot.config_store.data["last_sha"].clear()
+    jambot.config_store.data["backfilled"].clear()
+    jambot.scheduler = jambot.PollScheduler()
+    reset_github(clear_cache=True)
+    return guild, admin
+
+def reset_github(clear_cache: bool):
+    if clear_cache:
+        jambot.github.cache.clear()
+    jambot.github.cache_hits = 0
+    jambot.github.cache_misses = 0
+    jambot.github.rate_limit = jambot.github.rate_remaining = jambot.github.rate_reset = None
+
+def reset_metrics():
+    with metrics.lock:
+        metrics.histograms.clear()
+        metrics.counters.clear()
+        metrics.gauges.clear()
+
+def histogram_counts(name: str, *labels: str):
+    counts = {}
+    total = 0.0
+    with metrics.lock:
+        for (metric, label_pairs), histogram in metrics.histograms.items():
+            if metric == name:
+                values = dict(label_pairs)
+                counts[" ".join(values.get(label, "-") for label in labels)] = histogram.count
+                total += histogram.sum
+    return dict(sorted(counts.items())), total
+
+def counter_total(name: str):
+    with metrics.lock:
+        return sum(value for (metric, _), value in metrics.counters.items() if metric == name)
+
+def error_counts():
+    with metrics.lock:
+        return {
+            f"{dict(labels).get('source')}:{dict(labels).get('operation')}": value
+            for (metric, labels), value in metrics.counters.items() if metric == "jambot_errors_total"
+        }
+
+async def measure(scenario: str, teams: int, github_server: FakeGitHub, run):
+    reset_metrics()
+    github_server.reset()
+    if not args.no_memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        started_at = time.perf_counter()
+        output = await run()
+        wall = time.perf_counter() - started_at
+
+    discord_calls, discord_seconds = histogram_counts("jambot_discord_request_seconds", "method", "route")
+    _, discord_bucket_wait = histogram_counts("jambot_discord_bucket_wait_seconds", "method", "route")
+    mongo_calls, mongo_seconds = histogram_counts("jambot_mongo_command_seconds", "command")
+    github_calls, github_seconds = histogram_counts("jambot_github_request_seconds", "endpoint")
+    result = {
+        "teams": teams,
+        "scenario": scenario,
+        "wall_seconds": round(wall, 4),
+        "discord_calls": discord_calls,
+        "discord_call_total": sum(discord_calls.values()),
+        "discord_seconds": round(discord_seconds, 4),
+        "discord_rate_limited": int(counter_total("jambot_discord_rate_limited_total")),
+        "discord_rate_limit_wait_seconds": round(counter_total("jambot_discord_rate_limit_wait_seconds_total"), 4),
+        "discord_bucket_wait_seconds": round(discord_bucket_wait, 4),
+        "mongo_calls": mongo_calls,
+        "mongo_call_total": sum(mongo_calls.values()),
+        "mongo_seconds": round(mongo_seconds, 4),
+        "github_calls": github_calls,
+        "github_call_total": sum(github_calls.values()),
+        "github_seconds": round(github_seconds, 4),
+        "github_server": dict(github_server.counts),
+        "github_cache": jambot.github.cache_stats(),
+        "errors": error_counts(),
+        "output": output,
+    }
+    if not args.no_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        result["peak_memory_bytes"] = peak
+        result["peak_memory_growth_bytes"] = peak - baseline
+    print(
+        f"{scenario:<24} {teams:>6} teams {wall:9.3f}s  "
+        f"discord {result['discord_call_total']:>6}  mongo {result['mongo_call_total']:>5}  github {result['github_call_total']:>5}  "
+        f"429s {result['discord_rate_limited']:>4}  waited {discord_bucket_wait:7.2f}s" + (f"  peak {result['peak_memory_bytes'] / 1e6:8.1f} MB" if not args.no_memory else "")
+    )
+    return result
+
+async def run_size(teams: int, github_server: FakeGitHub):
+    guild, admin = await build_world(teams, github_server)
+
+    async def command(handler, *handler_args, **kwargs):
+        interaction = FakeInteraction(guild, admin)
+        if handler in (jambot.setup_channels, jambot.setup_roles):
+            await interaction.response.defer()
+            await handler(interaction, guild, *handler_args, **kwargs)
+        else:
+            await handler(interaction, *handler_args, **kwargs)
+        return interaction.last_output()
+
+    async def watch_sweep(fresh_schedule: bool):
+        if fresh_schedule:
+            jambot.scheduler = jambot.PollScheduler()
+        else:
+            for name in jambot.scheduler.repos:
+                jambot.scheduler.schedule(name, 0)
+        reset_github(clear_cache=False)
+        await jambot.github_watch_loop.coro()
+        return f"{len(jambot.config_store.data['last_sha'])} repo(s) with a late head commit"
+
+    async def timestamp(mode: str):
+        jambot.GITHUB_FETCH_MODE = mode
+        reset_github(clear_cache=True)
+        try:
+            return await command(jambot.githubtimestamp.callback, refresh=True)
+        finally:
+            jambot.GITHUB_FETCH_MODE = "rest"
+
+    scenarios = [
+        ("setup_roles", lambda: command(jambot.setup_roles)),
+        ("setup_channels", lambda: command(jambot.setup_channels)),
+        ("setup_channels_noop", lambda: command(jambot.setup_channels)),
+        ("setup_channels_plan", lambda: command(jambot.setup_channels, plan=True)),
+        ("github_watch_cold", lambda: watch_sweep(fresh_schedule=False)),
+        ("github_watch_warm", lambda: watch_sweep(fresh_schedule=True)),
+        ("github_watch_steady", lambda: watch_sweep(fresh_schedule=False)),
+        ("githubtimestamp_rest", lambda: timestamp("rest")),
+        ("githubtimestamp_graphql", lambda: timestamp("graphql")),
+    ]
+    results = []
+    for scenario, run in scenarios:
+        results.append(await measure(scenario, teams, github_server, run))
+    return results
+
+def git_revision():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo_dir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ("-dirty" if dirty else "")
+
+def compare(results: list[dict], path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = {(r["teams"], r["scenario"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {path}:")
+    for result in results:
+        before = baseline.get((result["teams"], result["scenario"]))
+        if not before or not before["wall_seconds"]:
+            continue
+        change = (result["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+        calls_before = before["discord_call_total"] + before["mongo_call_total"] + before["github_call_total"]
+        calls_after = result["discord_call_total"] + result["mongo_call_total"] + result["github_call_total"]
+        print(f"{result['scenario']:<24} {result['teams']:>6} teams {before['wall_seconds']:9.3f}s -> {result['wall_seconds']:9.3f}s ({change:+6.1f}%)  calls {calls_before} -> {calls_after}")
+
+async def main():
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    github_server = FakeGitHub(args.github_latency, args.late_commits, args.github_quota)
+    github_server.start()
+    jambot.GITHUB_API = github_server.url
+    if not args.no_memory:
+        tracemalloc.start()
+
+    results = []
+    try:
+        for teams in sizes:
+            results.extend(await run_size(teams, github_server))
+    finally:
+        await jambot.github.close()
+        github_server.stop()
+        if args.mongouri:
+            await jambot.mongo_client.drop_database(args.database)
+
+    report = {
+        "revision": git_revision(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "versions": {"discord.py": discord.__version__, "aiohttp": aiohttp.__version__},
+        "settings": {
+            "sizes": sizes,
+            "members_per_team": args.members_per_team,
+            "late_commits": args.late_commits,
+            "discord_latency": args.discord_latency,
+            "buckets": {name: f"{limit}/{per:g}" for name, (limit, per) in buckets.items()},
+            "github_latency": args.github_latency,
+            "github_quota": args.github_quota,
+            "mongo": "mongodb" if args.mongouri else "memory",
+            "mongo_latency": None if args.mongouri else args.mongo_latency,
+            "memory_tracing": not args.no_memory,
+            "env": {key: value for key, value in os.environ.items() if key.startswith(("github_", "setup_", "mongo_", "progress_"))},
+        },
+        "results": results,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} result(s) to {output_path}")
+
+    if compare_path:
+        compare(results, compare_path)
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    finally:
+        os.chdir(repo_dir)
+        workdir.cleanup()
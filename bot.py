@@ -1,15 +1,30 @@
 import asyncio
+import contextvars
+import csv
+import gzip
+import hashlib
+import heapq
+import hmac
+import io
 import json
 import os
-from datetime import datetime
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 
+import aiohttp
 import discord
-import requests
+from aiohttp import web
+from bson import ObjectId
 from discord import app_commands, guild, role
 from discord.app_commands.commands import choices, describe
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, DeleteOne, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 
 load_dotenv()
 
@@ -36,17 +51,341 @@ if not MONGOURI:
     print('ERROR: MongoDB connection string is undefined')
     exit(1)
 
-mongo_client = AsyncIOMotorClient(MONGOURI)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_HOST = os.getenv("metrics_host", "127.0.0.1")
+METRICS_PORT = os.getenv("metrics_port")
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q: float):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: dict[tuple, Histogram] = {}
+        self.counters: dict[tuple, float] = {}
+        self.gauges: dict[tuple, float] = {}
+        self.help: dict[str, str] = {}
+
+    @staticmethod
+    def key(name: str, labels: dict):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def observe(self, name: str, seconds: float, **labels):
+        with self.lock:
+            self.histograms.setdefault(self.key(name, labels), Histogram()).observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            key = self.key(name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges[self.key(name, labels)] = value
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                names = set()
+                for (name, labels), value in sorted(values.items()):
+                    if name not in names:
+                        names.add(name)
+                        lines.append(f"# TYPE {name} {kind}")
+                    lines.append(f"{name}{self.format_labels(labels)} {value}")
+            names = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in names:
+                    names.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.buckets):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self.format_labels(labels, [('le', str(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{self.format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{self.format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{self.format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.observe("jambot_mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        metrics.observe("jambot_mongo_command_seconds", event.duration_micros / 1e6, command=event.command_name)
+        metrics.inc("jambot_errors_total", source="mongo", operation=event.command_name)
+
+DISCORD_ID_PATTERN = re.compile(r"/\d{15,21}")
+DISCORD_TOKEN_PATTERN = re.compile(r"(/(?:webhooks|interactions)/:id)/[^/]+")
+DISCORD_TEMPLATE_PATTERN = re.compile(r"\{(\w+)\}")
+discord_http_seconds: contextvars.ContextVar[list | None] = contextvars.ContextVar("discord_http_seconds", default=None)
+
+def discord_route(path: str):
+    return DISCORD_TOKEN_PATTERN.sub(r"\1/:token", DISCORD_ID_PATTERN.sub("/:id", path))
+
+def record_discord_http(started_at: float):
+    elapsed = time.perf_counter() - started_at
+    spent = discord_http_seconds.get()
+    if spent is not None:
+        spent[0] += elapsed
+    return elapsed
+
+async def on_discord_request_start(session, ctx, params):
+    ctx.started_at = time.perf_counter()
+
+async def on_discord_request_end(session, ctx, params):
+    route = discord_route(params.url.path)
+    status = params.response.status
+    metrics.observe("jambot_discord_request_seconds", record_discord_http(ctx.started_at), method=params.method, route=route)
+    if status == 429:
+        metrics.inc("jambot_discord_rate_limited_total", route=route)
+        try:
+            retry_after = float(params.response.headers.get("Retry-After", 0))
+        except ValueError:
+            retry_after = 0
+        metrics.inc("jambot_discord_rate_limit_wait_seconds_total", retry_after, route=route)
+    elif status >= 400:
+        metrics.inc("jambot_errors_total", source="discord", operation=f"{params.method} {route}")
+
+async def on_discord_request_exception(session, ctx, params):
+    record_discord_http(ctx.started_at)
+    route = discord_route(params.url.path)
+    metrics.inc("jambot_errors_total", source="discord", operation=f"{params.method} {route}")
+
+discord_trace = aiohttp.TraceConfig()
+discord_trace.on_request_start.append(on_discord_request_start)
+discord_trace.on_request_end.append(on_discord_request_end)
+discord_trace.on_request_exception.append(on_discord_request_exception)
+
+class MetricsCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        command = interaction.command.name if interaction.command else "unknown"
+        metrics.inc("jambot_errors_total", source="command", operation=command)
+        started_at = interaction.extras.get("started_at")
+        if started_at is not None:
+            metrics.observe("jambot_command_seconds", time.perf_counter() - started_at, command=command)
+        await super().on_error(interaction, error)
+
+mongo_client = AsyncIOMotorClient(MONGOURI, event_listeners=[MongoCommandMetrics()])
 db = mongo_client.codejam
 roles_collection = db.roles
 team_members_collection = db.team_members  
+commits_collection = db.commits
+setup_checkpoints_collection = db.setup_checkpoints
+broadcasts_collection = db.broadcasts
+deliveries_collection = db.broadcast_deliveries
+reminders_collection = db.reminders
+polls_collection = db.polls
 
 intents = discord.Intents.default()
 intents.members = True  
 
 intents.message_content = True  
 
-bot = commands.Bot(command_prefix='/', intents=intents)
+bot = commands.Bot(command_prefix='/', intents=intents, tree_cls=MetricsCommandTree, http_trace=discord_trace)
+discord_http_request = bot.http.request
+
+async def timed_discord_request(route, **kwargs):
+    spent = [0.0]
+    token = discord_http_seconds.set(spent)
+    started_at = time.perf_counter()
+    try:
+        return await discord_http_request(route, **kwargs)
+    finally:
+        discord_http_seconds.reset(token)
+        label = DISCORD_TEMPLATE_PATTERN.sub(lambda m: ":token" if m.group(1).endswith("token") else ":id", route.path)
+        wait = max(time.perf_counter() - started_at - spent[0], 0.0)
+        metrics.observe("jambot_discord_bucket_wait_seconds", wait, method=route.method, route=label)
+
+bot.http.request = timed_discord_request
+
+async def ensure_indexes():
+    indexes = [
+        (roles_collection, [("name", ASCENDING)], {"unique": True}),
+        (team_members_collection, [("team_name", ASCENDING), ("discord_id", ASCENDING)], {"unique": True}),
+        (commits_collection, [("team", ASCENDING), ("sha", ASCENDING)], {"unique": True}),
+        (commits_collection, [("committed_at", ASCENDING)], {}),
+        (commits_collection, [("team", ASCENDING), ("committed_at", DESCENDING)], {}),
+        (broadcasts_collection, [("status", ASCENDING)], {}),
+        (deliveries_collection, [("broadcast_id", ASCENDING), ("channel_id", ASCENDING)], {"unique": True}),
+        (deliveries_collection, [("broadcast_id", ASCENDING), ("state", ASCENDING)], {}),
+        (reminders_collection, [("sent", ASCENDING), ("due_at", ASCENDING)], {}),
+        (polls_collection, [("open", ASCENDING)], {}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            print(f'Error creating index {keys} on {collection.name}: {e}')
+
+TEAM_POLL_INTERVAL = float(os.getenv("team_poll_interval", "60"))
+MONGO_BATCH_SIZE = int(os.getenv("mongo_batch_size", "500"))
+TEAM_FIELDS = {"name": 1, "githubRepo": 1, "githubUsernames": 1, "status": 1}
+
+class TeamRegistry:
+    def __init__(self, collection):
+        self.collection = collection
+        self.by_name: dict[str, dict] = {}
+        self.by_repo: dict[str, str] = {}
+        self.names_by_id: dict = {}
+        self.loaded = False
+        self._watch_task: asyncio.Task | None = None
+
+    @staticmethod
+    def repo_key(link: str):
+        try:
+            owner, repo = repo_slug(link)
+        except IndexError:
+            return link.strip().lower()
+        return f"{owner}/{repo}".lower()
+
+    async def load(self):
+        registry = TeamRegistry(self.collection)
+        async for team in self.collection.find({}, TEAM_FIELDS).batch_size(MONGO_BATCH_SIZE):
+            registry.put(team)
+        self.by_name, self.by_repo, self.names_by_id = registry.by_name, registry.by_repo, registry.names_by_id
+        self.loaded = True
+
+    def put(self, team: dict):
+        name = team.get("name")
+        if not name:
+            return
+        self.remove(name)
+        self.by_name[name] = team
+        if team.get("_id") is not None:
+            self.names_by_id[team["_id"]] = name
+        if team.get("githubRepo"):
+            self.by_repo[self.repo_key(team["githubRepo"])] = name
+
+    def remove(self, name: str):
+        team = self.by_name.pop(name, None)
+        if not team:
+            return
+        self.names_by_id.pop(team.get("_id"), None)
+        if team.get("githubRepo"):
+            key = self.repo_key(team["githubRepo"])
+            if self.by_repo.get(key) == name:
+                del self.by_repo[key]
+
+    def update(self, name: str, fields: dict):
+        team = self.by_name.get(name)
+        if team:
+            self.put({**team, **fields})
+
+    async def all(self):
+        if not self.loaded:
+            await self.load()
+        return list(self.by_name.values())
+
+    async def get(self, name: str):
+        if not self.loaded:
+            await self.load()
+        return self.by_name.get(name)
+
+    async def get_by_repo(self, full_name: str):
+        if not self.loaded:
+            await self.load()
+        name = self.by_repo.get(full_name.lower())
+        return self.by_name.get(name) if name else None
+
+    def apply_change(self, change: dict):
+        operation = change["operationType"]
+        if operation in ("insert", "update", "replace"):
+            team = change.get("fullDocument")
+            old_name = self.names_by_id.get(change["documentKey"]["_id"])
+            if old_name:
+                self.remove(old_name)
+            if team:
+                self.put({**team, "_id": change["documentKey"]["_id"]})
+        elif operation == "delete":
+            name = self.names_by_id.get(change["documentKey"]["_id"])
+            if name:
+                self.remove(name)
+        elif operation in ("drop", "rename", "invalidate"):
+            self.by_name, self.by_repo, self.names_by_id = {}, {}, {}
+
+    def start(self):
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            try:
+                pipeline = [{"$project": {"operationType": 1, "documentKey": 1, "fullDocument._id": 1, **{f"fullDocument.{field}": 1 for field in TEAM_FIELDS}}}]
+                async with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+                    await self.load()
+                    async for change in stream:
+                        self.apply_change(change)
+            except OperationFailure as e:
+                print(f"Team change stream unavailable ({e}), reloading teams every {TEAM_POLL_INTERVAL:.0f}s instead")
+                await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Team change stream error: {e}")
+                await asyncio.sleep(5)
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Error reloading teams: {e}")
+            await asyncio.sleep(TEAM_POLL_INTERVAL)
+
+team_registry = TeamRegistry(roles_collection)
+
+async def load_state():
+    for name, load in (
+        ("indexes", ensure_indexes),
+        ("GitHub watch config", config_store.load),
+        ("reminders", reminder_scheduler.load),
+        ("polls", poll_engine.load),
+    ):
+        try:
+            await load()
+        except Exception as e:
+            print(f"Error loading {name}: {e}")
+    reminder_scheduler.start()
 
 async def check_permission(interaction: discord.Interaction) -> bool:
     return (interaction.user.guild_permissions.administrator or 
@@ -54,6 +393,10 @@ async def check_permission(interaction: discord.Interaction) -> bool:
 
 @bot.event
 async def on_ready():
+    team_registry.start()
+    spawn(load_state())
+    if not poll_flush_loop.is_running():
+        poll_flush_loop.start()
     if not github_watch_loop.is_running():
         github_watch_loop.start()
     print(f'Logged in as {bot.user}!')
@@ -66,6 +409,8 @@ async def on_ready():
 
     print(f'Bot is in guild: {guild.name}')
     print(f'Guild has {guild.member_count} members')
+    role_members.build(guild)
+    spawn(resume_broadcasts())
 
     print('Syncing commands...')
     try:
@@ -85,77 +430,410 @@ async def on_ready():
         import traceback
         traceback.print_exc()
 
+class RoleMemberIndex:
+    def __init__(self):
+        self.members: dict[int, set[int]] = {}
+        self.ready = False
+
+    def build(self, guild: discord.Guild):
+        self.members = {}
+        for member in guild.members:
+            self.add(member.id, [role.id for role in member.roles if not role.is_default()])
+        self.ready = True
+
+    def add(self, member_id: int, role_ids):
+        for role_id in role_ids:
+            self.members.setdefault(role_id, set()).add(member_id)
+
+    def remove(self, member_id: int, role_ids):
+        for role_id in role_ids:
+            ids = self.members.get(role_id)
+            if ids:
+                ids.discard(member_id)
+
+    def update(self, before: discord.Member, after: discord.Member):
+        before_ids = {role.id for role in before.roles if not role.is_default()}
+        after_ids = {role.id for role in after.roles if not role.is_default()}
+        self.remove(after.id, before_ids - after_ids)
+        self.add(after.id, after_ids - before_ids)
+
+    def members_of(self, guild: discord.Guild, role: discord.Role):
+        if not self.ready:
+            return role.members
+        members = []
+        for member_id in self.members.get(role.id, ()):
+            member = guild.get_member(member_id)
+            if member:
+                members.append(member)
+        return members
+
+role_members = RoleMemberIndex()
+
 @bot.event
 async def on_member_join(member):
     print(f'New member joined: {member.name}')
+    if member.guild.id == serverid:
+        role_members.add(member.id, [role.id for role in member.roles if not role.is_default()])
 
-CONFIG_PATH = "github_watch_config.json"
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if after.guild.id == serverid and before.roles != after.roles:
+        role_members.update(before, after)
 
-def load_config():
-    if not os.path.exists(CONFIG_PATH):
-        return {"enabled": False, "last_sha": {}}
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+@bot.event
+async def on_member_remove(member: discord.Member):
+    if member.guild.id == serverid:
+        role_members.remove(member.id, [role.id for role in member.roles])
 
-def save_config(cfg):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, indent=2)
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    if role.guild.id == serverid:
+        role_members.members.pop(role.id, None)
 
-cfg = load_config()
-limit= datetime.fromisoformat("2025-12-30T18:30:00+00:00")
+CONFIG_PATH = "github_watch_config.json"
+CONFIG_BACKEND = os.getenv("config_backend", "file")
+CONFIG_FLUSH_DELAY = float(os.getenv("config_flush_delay", "5"))
+
+class ConfigStore:
+    def __init__(self, path: str, backend: str, collection):
+        self.path = path
+        self.backend = backend
+        self.collection = collection
+        self.data = {"enabled": False, "last_sha": {}, "backfilled": {}}
+        self.dirty_enabled = False
+        self.dirty_shas: set[str] = set()
+        self._flush_task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self._migrated = False
+
+    def load_file(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data.update(json.load(f))
+            self.data.setdefault("last_sha", {})
+            self.data.setdefault("backfilled", {})
+
+    async def load(self):
+        if self.backend != "mongo":
+            return
+        found = False
+        async for doc in self.collection.find({}).batch_size(MONGO_BATCH_SIZE):
+            found = True
+            if doc["_id"] == "settings":
+                if not self.dirty_enabled:
+                    self.data["enabled"] = doc.get("enabled", False)
+            elif doc.get("team") and doc["team"] not in self.dirty_shas:
+                if doc.get("last_sha"):
+                    self.data["last_sha"][doc["team"]] = doc["last_sha"]
+                if doc.get("backfilled"):
+                    self.data["backfilled"][doc["team"]] = True
+
+        if not found and not self._migrated and os.path.exists(self.path):
+            self.load_file()
+            self.dirty_enabled = True
+            self.dirty_shas |= set(self.data["last_sha"]) | set(self.data["backfilled"])
+            await self.flush()
+            print(f"Moved GitHub watch config from {self.path} to MongoDB")
+        self._migrated = True
+
+    def set_enabled(self, enabled: bool):
+        self.data["enabled"] = enabled
+        self.dirty_enabled = True
+        self.schedule_flush()
+
+    def set_last_sha(self, team: str, sha: str | None):
+        if sha is None:
+            self.data["last_sha"].pop(team, None)
+        else:
+            self.data["last_sha"][team] = sha
+        self.dirty_shas.add(team)
+        self.schedule_flush()
+
+    def set_backfilled(self, team: str):
+        self.data["backfilled"][team] = True
+        self.dirty_shas.add(team)
+        self.schedule_flush()
+
+    def forget(self, team: str):
+        self.data["last_sha"].pop(team, None)
+        self.data["backfilled"].pop(team, None)
+        self.dirty_shas.add(team)
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(CONFIG_FLUSH_DELAY)
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self.dirty_enabled and not self.dirty_shas:
+                return
+            dirty_enabled, dirty_shas = self.dirty_enabled, self.dirty_shas
+            self.dirty_enabled, self.dirty_shas = False, set()
+            try:
+                if self.backend == "mongo":
+                    await self._write_mongo(dirty_enabled, dirty_shas)
+                else:
+                    snapshot = json.dumps(self.data, indent=2)
+                    await asyncio.to_thread(self._write_file, snapshot)
+            except Exception as e:
+                print(f"Error saving GitHub watch config: {e}")
+                self.dirty_enabled = self.dirty_enabled or dirty_enabled
+                self.dirty_shas |= dirty_shas
 
-def get_commits(link: str):
-    GITHUB_TOKEN=os.getenv("PAT")
-    comps=link.split("/")
-    owner=comps[-2] 
-    repo= comps[-1]
-    COMMIT_URL=f"https://api.github.com/repos/{owner}/{repo}/commits?per_page=15"
+    def _write_file(self, snapshot: str):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".github_watch_config.", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(snapshot)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def _write_mongo(self, dirty_enabled: bool, dirty_shas: set[str]):
+        operations = []
+        if dirty_enabled:
+            operations.append(UpdateOne({"_id": "settings"}, {"$set": {"enabled": self.data["enabled"]}}, upsert=True))
+        for team in dirty_shas:
+            sha = self.data["last_sha"].get(team)
+            backfilled = self.data["backfilled"].get(team, False)
+            if sha is None and not backfilled:
+                operations.append(DeleteOne({"_id": f"sha:{team}"}))
+            else:
+                operations.append(UpdateOne({"_id": f"sha:{team}"}, {"$set": {"team": team, "last_sha": sha, "backfilled": backfilled}}, upsert=True))
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+config_store = ConfigStore(CONFIG_PATH, CONFIG_BACKEND, db.github_watch)
+if CONFIG_BACKEND != "mongo":
+    config_store.load_file()
+cfg = config_store.data
+limit= datetime.fromisoformat("2025-12-30T18:30:00+00:00")
 
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-    }
-    response = requests.get(COMMIT_URL, headers=headers)
-    try:
-        response.raise_for_status()
-    except:
-        return []
-    return response.json()
-
-def check_timestamps(link: str):
-    commits=get_commits(link)
-    if not commits:
-        return 0
-
-    count=0 
-    headCommitTime=datetime.fromisoformat(commits[0]["commit"]["committer"]["date"].replace("Z", "+00:00"))
-    if(headCommitTime>limit):
+GITHUB_API = "https://api.github.com"
+GITHUB_TIMEOUT = float(os.getenv("github_timeout", "15"))
+GITHUB_CONNECT_TIMEOUT = float(os.getenv("github_connect_timeout", "5"))
+GITHUB_MAX_CONNECTIONS = int(os.getenv("github_max_connections", "20"))
+GITHUB_MAX_CONCURRENCY = int(os.getenv("github_max_concurrency", "10"))
+GITHUB_FANOUT = int(os.getenv("github_fanout", "16"))
+GITHUB_REPO_TIMEOUT = float(os.getenv("github_repo_timeout", "60"))
+GITHUB_RATE_RESERVE = int(os.getenv("github_rate_reserve", "200"))
+WATCH_TICK_SECONDS = int(os.getenv("github_watch_tick", "30"))
+WATCH_ACTIVE_INTERVAL = int(os.getenv("github_watch_active_interval", "60"))
+WATCH_DEFAULT_INTERVAL = int(os.getenv("github_watch_interval", "300"))
+WATCH_IDLE_INTERVAL = int(os.getenv("github_watch_idle_interval", "900"))
+WATCH_ACTIVE_WINDOW = int(os.getenv("github_watch_active_window", "1800"))
+GITHUB_FETCH_MODE = os.getenv("github_fetch_mode", "rest")
+GITHUB_GRAPHQL_BATCH = int(os.getenv("github_graphql_batch", "25"))
+WEBHOOK_HOST = os.getenv("webhook_host", "0.0.0.0")
+WEBHOOK_PORT = os.getenv("webhook_port")
+WEBHOOK_SECRET = os.getenv("webhook_secret")
+
+class GitHubClient:
+    def __init__(self, token: str | None, timeout: float, connect_timeout: float, max_connections: int, max_concurrency: int):
+        self.token = token
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.max_connections = max_connections
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: aiohttp.ClientSession | None = None
+        self.cache: dict[tuple, dict] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rate_limit: int | None = None
+        self.rate_remaining: int | None = None
+        self.rate_reset: float | None = None
+
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            headers = {
+                "Accept": "application/vnd.github+json",
+                "User-Agent": "jambot",
+            }
+            if self.token:
+                headers["Authorization"] = f"token {self.token}"
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(base_url=GITHUB_API, headers=headers, timeout=self.timeout, connector=connector)
+        return self._session
+
+    async def get_page(self, path: str, params: dict | None = None, cache: bool = False):
+        key = (path, tuple(sorted((params or {}).items())))
+        cached = self.cache.get(key) if cache else None
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        endpoint = path.rsplit("/", 1)[-1]
+        async with self.semaphore:
+            started_at = time.perf_counter()
+            try:
+                async with self.session().get(path, params=params, headers=headers) as response:
+                    self.update_rate_limit(response.headers)
+                    if response.status == 304 and cached:
+                        self.cache_hits += 1
+                        metrics.inc("jambot_cache_requests_total", cache="github", result="hit")
+                        return cached["data"], cached["next"]
+                    response.raise_for_status()
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                metrics.inc("jambot_errors_total", source="github", operation=endpoint)
+                raise
+            finally:
+                metrics.observe("jambot_github_request_seconds", time.perf_counter() - started_at, endpoint=endpoint)
+
+        next_page = None
+        next_link = response.links.get("next")
+        if next_link:
+            next_url = next_link["url"]
+            next_page = (next_url.path, dict(next_url.query))
+
+        if cache:
+            self.cache_misses += 1
+            metrics.inc("jambot_cache_requests_total", cache="github", result="miss")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self.cache[key] = {"etag": etag, "last_modified": last_modified, "data": data, "next": next_page}
+        return data, next_page
+
+    async def get_json(self, path: str, params: dict | None = None, cache: bool = False):
+        data, _ = await self.get_page(path, params, cache)
+        return data
+
+    async def graphql(self, query: str, variables: dict):
+        async with self.semaphore:
+            started_at = time.perf_counter()
+            try:
+                async with self.session().post("/graphql", json={"query": query, "variables": variables}) as response:
+                    response.raise_for_status()
+                    return await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                metrics.inc("jambot_errors_total", source="github", operation="graphql")
+                raise
+            finally:
+                metrics.observe("jambot_github_request_seconds", time.perf_counter() - started_at, endpoint="graphql")
+
+    def update_rate_limit(self, headers):
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        try:
+            if "X-RateLimit-Limit" in headers:
+                self.rate_limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                self.rate_remaining = int(headers["X-RateLimit-Remaining"])
+                metrics.set("jambot_github_rate_remaining", self.rate_remaining)
+            if "X-RateLimit-Reset" in headers:
+                self.rate_reset = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            pass
+
+    def quota_fraction(self):
+        if self.rate_limit is None or self.rate_remaining is None or self.rate_limit <= 0:
+            return 1.0
+        return self.rate_remaining / self.rate_limit
+
+    def cache_stats(self):
+        total = self.cache_hits + self.cache_misses
+        hit_rate = (self.cache_hits / total * 100) if total else 0.0
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "hit_rate": hit_rate, "entries": len(self.cache)}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+github = GitHubClient(os.getenv("PAT"), GITHUB_TIMEOUT, GITHUB_CONNECT_TIMEOUT, GITHUB_MAX_CONNECTIONS, GITHUB_MAX_CONCURRENCY)
+
+def repo_slug(link: str):
+    comps = link.strip().rstrip("/").removesuffix(".git").split("/")
+    owner = comps[-2]
+    repo = comps[-1]
+    return owner, repo
+
+async def iter_commits(link: str, since: datetime | None = None, per_page: int = 100):
+    owner, repo = repo_slug(link)
+    params = {"per_page": str(per_page)}
+    if since:
+        params["since"] = since.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    page = (f"/repos/{owner}/{repo}/commits", params)
+    while page:
+        commits, page = await github.get_page(*page, cache=True)
         for commit in commits:
-            time=commit["commit"]["committer"]["date"].replace("Z", "+00:00")
-            if(datetime.fromisoformat(time)>limit):
-                count+=1
-        return count
-    else:
-        return 0
+            yield commit
+
+def commit_time(commit: dict):
+    return datetime.fromisoformat(commit["commit"]["committer"]["date"].replace("Z", "+00:00"))
 
-def get_late_commits(link: str, last_sha: str | None):
-    commits = get_commits(link)
-    if not commits:
-        return []
+def commit_entry(commit: dict):
+    return {"sha": commit["sha"], "msg": commit["commit"]["message"].splitlines()[0], "committed_at": commit_time(commit)}
 
+async def fetch_late_history(link: str):
+    try:
+        return [commit async for commit in iter_commits(link, since=limit) if commit_time(commit) > limit]
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching commits for {link}: {e}")
+        return None
+
+async def scan_commits(link: str, last_sha: str | None, backfill: bool = False):
+    head_sha = None
     late = []
-    for commit in commits: 
+    history = [] if backfill else None
+    reached_last = False
+    async for commit in iter_commits(link):
         sha = commit.get("sha")
-        if last_sha and sha == last_sha:
+        if head_sha is None:
+            head_sha = sha
+        if sha == last_sha:
+            reached_last = True
+            if not backfill:
+                break
+        if commit_time(commit) <= limit:
             break
+        entry = commit_entry(commit)
+        if not reached_last:
+            late.append(entry)
+        if backfill:
+            history.append(entry)
+
+    late.reverse()
+    if history is not None:
+        history.reverse()
+    return head_sha, late, history
+
+async def store_commits(team: str, repo: str, late_commits: list[dict]):
+    if not late_commits:
+        return
+    operations = [
+        UpdateOne(
+            {"team": team, "sha": c["sha"]},
+            {"$setOnInsert": {"repo": repo, "message": c["msg"], "committed_at": c["committed_at"]}},
+            upsert=True,
+        )
+        for c in late_commits
+    ]
+    await commits_collection.bulk_write(operations, ordered=False)
 
-        time = commit["commit"]["committer"]["date"].replace("Z", "+00:00")
-        commit_time = datetime.fromisoformat(time)
-        if commit_time > limit:
-            msg = commit["commit"]["message"].splitlines()[0]
-            late.append({"sha": sha, "msg": msg})
+async def forget_commits(team: str):
+    await commits_collection.delete_many({"team": team})
+    if team in cfg["last_sha"] or team in cfg["backfilled"]:
+        config_store.forget(team)
 
-    late.reverse()  
-    return late
+async def stored_late_counts(teams: list[str]):
+    pipeline = [
+        {"$match": {"team": {"$in": teams}, "committed_at": {"$gt": limit}}},
+        {"$group": {"_id": "$team", "count": {"$sum": 1}}},
+    ]
+    return {row["_id"]: row["count"] async for row in commits_collection.aggregate(pipeline)}
 
 async def send_late_commits(guild: discord.Guild, team: str, late_commits: list[dict]):
     channel = discord.utils.get(guild.text_channels, name=team)
@@ -181,10 +859,17 @@ async def addrepo(interaction: discord.Interaction, team_name: str, github_repo:
         await interaction.followup.send("You do not have permission to use this command for this team name. Please use your own team name.")
         return
 
-    await roles_collection.update_one(
+    previous = await roles_collection.find_one_and_update(
         {"name": team_name},
-        {"$set": {"githubRepo": github_repo}}
+        {"$set": {"githubRepo": github_repo}},
+        projection={"githubRepo": 1}
     )
+    if previous is None:
+        await interaction.followup.send(f'Team "{team_name}" does not exist. Create it first with `/createteam`.')
+        return
+    team_registry.update(team_name, {"githubRepo": github_repo})
+    if github_repo != previous.get("githubRepo"):
+        await forget_commits(team_name)
     await interaction.followup.send(f"Saved repo for `{team_name}`: `{github_repo}`")
 
 @bot.tree.command(name="githubwatch",description="Toggle GitHub deadline watcher and messaging",guild=discord.Object(id=serverid))
@@ -202,53 +887,254 @@ async def githubwatch(interaction: discord.Interaction, action: app_commands.Cho
     if state not in ["on", "off"]:
         await interaction.response.send_message("Use: /githubwatch on OR /githubwatch off", ephemeral=True)
         return
-    cfg["enabled"] = state == "on"
-    save_config(cfg)
+    config_store.set_enabled(state == "on")
+    await config_store.flush()
     await interaction.response.send_message(f"GitHub watcher is now {state.upper()}.", ephemeral=True)
 
-@tasks.loop(minutes=5)
+async def fan_out(items, fetch):
+    semaphore = asyncio.Semaphore(GITHUB_FANOUT)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return item, await asyncio.wait_for(fetch(item), GITHUB_REPO_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"Timed out fetching {item}")
+                return item, None
+            except Exception as e:
+                print(f"Error fetching {item}: {e}")
+                return item, None
+
+    for task in asyncio.as_completed([run(item) for item in items]):
+        yield await task
+
+HISTORY_FIELDS = """
+defaultBranchRef {
+  target {
+    ... on Commit {
+      history(first: 100, since: $since) {
+        pageInfo { hasNextPage }
+        nodes { oid committedDate message }
+      }
+    }
+  }
+}
+"""
+
+async def fetch_history_chunk(repos: dict[str, str], since: datetime):
+    names = list(repos)
+    params = ["$since: GitTimestamp!"]
+    fields = []
+    variables = {"since": since.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    for i, name in enumerate(names):
+        owner, repo = repo_slug(repos[name])
+        params.append(f"$o{i}: String!, $n{i}: String!")
+        fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ {HISTORY_FIELDS} }}")
+        variables[f"o{i}"] = owner
+        variables[f"n{i}"] = repo
+    query = f"query({', '.join(params)}) {{ {' '.join(fields)} }}"
+
+    result = await github.graphql(query, variables)
+    errors = result.get("errors")
+    if errors:
+        print(f"GraphQL errors fetching {len(names)} repo(s): {'; '.join(e.get('message', str(e)) for e in errors[:3])}")
+        metrics.inc("jambot_errors_total", source="github", operation="graphql")
+    data = result.get("data")
+    if not data:
+        return None
+
+    histories = {}
+    for i, name in enumerate(names):
+        repository = data.get(f"r{i}")
+        if repository is None:
+            histories[name] = None
+            continue
+        branch = repository.get("defaultBranchRef")
+        if not branch:
+            histories[name] = []
+            continue
+        history = branch["target"]["history"]
+        if history["pageInfo"]["hasNextPage"]:
+            histories[name] = [commit async for commit in iter_commits(repos[name], since=since)]
+            continue
+        histories[name] = [
+            {"sha": node["oid"], "commit": {"message": node["message"], "committer": {"date": node["committedDate"]}}}
+            for node in history["nodes"]
+        ]
+    return histories
+
+async def fetch_histories(repos: dict[str, str], since: datetime):
+    names = list(repos)
+    chunks = [tuple(names[i:i + GITHUB_GRAPHQL_BATCH]) for i in range(0, len(names), GITHUB_GRAPHQL_BATCH)]
+    async for chunk, histories in fan_out(chunks, lambda chunk: fetch_history_chunk({name: repos[name] for name in chunk}, since)):
+        for name in chunk:
+            yield name, None if histories is None else histories.get(name)
+
+async def late_histories(repos: dict[str, str]):
+    if GITHUB_FETCH_MODE == "graphql" and github.token:
+        async for team, commits in fetch_histories(repos, limit):
+            yield team, commits
+    else:
+        async for team, commits in fan_out(repos, lambda team: fetch_late_history(repos[team])):
+            yield team, commits
+
+class PollScheduler:
+    def __init__(self):
+        self.heap: list[tuple[float, str]] = []
+        self.next_due: dict[str, float] = {}
+        self.repos: dict[str, str] = {}
+        self.last_push: dict[str, float] = {}
+        self.added: dict[str, float] = {}
+
+    def sync(self, teams: dict[str, str], now: float):
+        for name in list(self.repos):
+            if name not in teams:
+                del self.repos[name]
+                self.next_due.pop(name, None)
+                self.last_push.pop(name, None)
+                self.added.pop(name, None)
+        for name, repo in teams.items():
+            if self.repos.get(name) != repo:
+                self.repos[name] = repo
+                self.added[name] = now
+                self.schedule(name, now)
+
+    def schedule(self, name: str, due: float):
+        self.next_due[name] = due
+        heapq.heappush(self.heap, (due, name))
+
+    def pop_due(self, now: float):
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            when, name = heapq.heappop(self.heap)
+            if self.next_due.get(name) == when:
+                due.append((name, self.repos[name]))
+        return due
+
+    def mark_push(self, name: str, now: float):
+        if name in self.repos:
+            self.last_push[name] = now
+
+    def interval(self, name: str, now: float):
+        last_push = self.last_push.get(name)
+        quiet_since = last_push if last_push is not None else self.added.get(name, now)
+        if last_push is not None and now - last_push <= WATCH_ACTIVE_WINDOW:
+            interval = WATCH_ACTIVE_INTERVAL
+        elif now - quiet_since <= WATCH_ACTIVE_WINDOW * 4:
+            interval = WATCH_DEFAULT_INTERVAL
+        else:
+            interval = WATCH_IDLE_INTERVAL
+
+        fraction = github.quota_fraction()
+        if fraction < 0.5:
+            interval *= min(0.5 / max(fraction, 0.01), 8)
+        return interval
+
+    def reschedule(self, name: str, now: float, pushed: bool):
+        if name not in self.repos:
+            return
+        if pushed:
+            self.last_push[name] = now
+        due = now + self.interval(name, now)
+        if github.rate_remaining is not None and github.rate_remaining <= GITHUB_RATE_RESERVE and github.rate_reset:
+            if github.rate_reset + 1 > due:
+                metrics.inc("jambot_github_rate_limit_wait_seconds_total", github.rate_reset + 1 - due)
+                due = github.rate_reset + 1
+        self.schedule(name, due)
+
+scheduler = PollScheduler()
+
+@tasks.loop(seconds=WATCH_TICK_SECONDS)
 async def github_watch_loop():
+    await config_store.load()
     if not cfg.get("enabled"):
         return
     guild = bot.get_guild(serverid)
     if not guild:
         return
-    allTeams = await roles_collection.find({}).to_list(length=100)
+    allTeams = await team_registry.all()
     if not allTeams:
         return
 
+    teams = {}
     for each in allTeams:
         repo = each.get("githubRepo", "")
         name = each.get("name", "")
-        if not repo or not name:
+        if repo and name:
+            teams[name] = repo
+
+    now = time.time()
+    scheduler.sync(teams, now)
+    watched = scheduler.pop_due(now)
+    if not watched:
+        return
+    started_at = time.perf_counter()
+
+    async def fetch(team):
+        name, repo = team
+        return await scan_commits(repo, cfg["last_sha"].get(name), backfill=not cfg["backfilled"].get(name))
+
+    async for (name, repo), result in fan_out(watched, fetch):
+        if result is None:
+            scheduler.reschedule(name, time.time(), pushed=False)
             continue
+        head_sha, late_commits, history = result
 
-        last_sha = cfg.get("last_sha", {}).get(name, None)
-        late_commits = await asyncio.to_thread(get_late_commits, repo, last_sha)
+        try:
+            await store_commits(name, repo, late_commits if history is None else history)
+            if history is not None:
+                config_store.set_backfilled(name)
+        except Exception as e:
+            print(f"Error storing commits for {name}: {e}")
 
         if late_commits:
             try:
                 await send_late_commits(guild, name, late_commits)
-            except Exception:
-                pass
-
-        commits = await asyncio.to_thread(get_commits, repo)
-        if commits:
-            cfg.setdefault("last_sha", {})[name] = commits[0].get("sha")
-            save_config(cfg)
+            except Exception as e:
+                print(f"Error sending late commit alert for {name}: {e}")
+                metrics.inc("jambot_errors_total", source="watcher", operation="send_late_commits")
+
+        last_sha = cfg["last_sha"].get(name)
+        pushed = last_sha is not None and head_sha is not None and head_sha != last_sha
+        if head_sha and head_sha != last_sha:
+            config_store.set_last_sha(name, head_sha)
+        scheduler.reschedule(name, time.time(), pushed)
+
+    await config_store.flush()
+    metrics.observe("jambot_watch_sweep_seconds", time.perf_counter() - started_at)
+    metrics.inc("jambot_watch_repos_polled_total", len(watched))
+
+    stats = github.cache_stats()
+    print(f"GitHub watcher polled {len(watched)} repo(s), {github.rate_remaining} requests left. Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1f}% hit rate)")
+
+def chunk_lines(lines: list[str], limit: int = 4000):
+    chunks = []
+    text = ""
+    for line in lines:
+        line = line[:limit]
+        if text and len(text) + len(line) + 1 > limit:
+            chunks.append(text)
+            text = ""
+        text += line + "\n"
+    if text:
+        chunks.append(text)
+    return chunks
 
 @bot.tree.command(name="githubtimestamp", description="Mentions all teams who committed after deadline", guild=discord.Object(id=serverid))
-async def githubtimestamp(interaction: discord.Interaction):
+@app_commands.describe(refresh="Fetch from GitHub instead of using the commits the watcher already stored")
+async def githubtimestamp(interaction: discord.Interaction, refresh: bool = False):
     has_permission = await check_permission(interaction)
 
     if not has_permission:
         await interaction.response.send_message("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
         return
 
-    allTeams= await roles_collection.find({}).to_list(length=100)
+    await interaction.response.defer()
+
+    allTeams= await team_registry.all()
     try:
         if not allTeams:
-            await interaction.response.send_message("No teams found in the database.")
+            await interaction.followup.send("No teams found in the database.")
             return
         
         repos={}
@@ -259,22 +1145,217 @@ async def githubtimestamp(interaction: discord.Interaction):
             if repo:
                 repos[name]=repo
 
-        defaulters=[]
+        timed_out = []
+
+        if refresh or not cfg.get("enabled"):
+            async for team, commits in late_histories(repos):
+                if commits is None:
+                    timed_out.append(team)
+                    continue
+                await store_commits(team, repos[team], [commit_entry(c) for c in commits])
 
-        for team in repos.keys():
-            count = await asyncio.to_thread(check_timestamps, repos[team])
-            if(count):
-                defaulters.append(team+" "+"-"+" "+str(count))
+        counts = await stored_late_counts(list(repos))
 
-        embed = discord.Embed(
-            title="Defaulters",
-            description="\n".join(defaulters)
-        )
+        defaulters = [f"{team} - {counts[team]}" for team in sorted(counts)]
+        if timed_out:
+            defaulters.append(f"\nCould not refresh: {', '.join(sorted(timed_out))}")
 
-        await interaction.response.send_message(embed=embed)
+        chunks = chunk_lines(defaulters) or [""]
+        for i, chunk in enumerate(chunks):
+            title = "Defaulters" if len(chunks) == 1 else f"Defaulters ({i + 1}/{len(chunks)})"
+            embed = discord.Embed(title=title, description=chunk)
+            await interaction.followup.send(embed=embed)
     except Exception as error:
             print(f'Error fetching team list: {error}')
-            await interaction.response.send_message("An error occurred while fetching the team list.")
+            await interaction.followup.send("An error occurred while fetching the team list.")
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+async def process_push(payload: dict):
+    if not cfg.get("enabled"):
+        return
+    guild = bot.get_guild(serverid)
+    if not guild:
+        return
+
+    repository = payload.get("repository", {})
+    if payload.get("ref") != f"refs/heads/{repository.get('default_branch')}":
+        return
+
+    team = await team_registry.get_by_repo(repository.get("full_name", ""))
+    if not team:
+        return
+    name = team["name"]
+    scheduler.mark_push(name, time.time())
+    last_sha = cfg.get("last_sha", {}).get(name)
+
+    head_sha = payload.get("after")
+    if not head_sha or head_sha == last_sha:
+        return
+
+    commits = payload.get("commits", [])
+    if len(commits) >= 20:
+        try:
+            head_sha, late_commits, _ = await scan_commits(team["githubRepo"], last_sha)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error fetching commits for {name}: {e}")
+            return
+    else:
+        late_commits = []
+        for commit in commits:
+            pushed_at = datetime.fromisoformat(commit["timestamp"].replace("Z", "+00:00"))
+            if pushed_at > limit:
+                late_commits.append({"sha": commit["id"], "msg": commit["message"].splitlines()[0], "committed_at": pushed_at})
+
+    if late_commits:
+        try:
+            await store_commits(name, team["githubRepo"], late_commits)
+        except Exception as e:
+            print(f"Error storing commits for {name}: {e}")
+        try:
+            await send_late_commits(guild, name, late_commits)
+        except Exception as e:
+            print(f"Error sending late commit alert for {name}: {e}")
+
+    if head_sha and head_sha != last_sha:
+        config_store.set_last_sha(name, head_sha)
+
+background_tasks = set()
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def handle_github_webhook(request: web.Request):
+    body = await request.read()
+    if not verify_signature(WEBHOOK_SECRET, body, request.headers.get("X-Hub-Signature-256")):
+        return web.Response(status=401, text="Bad signature")
+
+    event = request.headers.get("X-GitHub-Event")
+    if event == "ping":
+        return web.Response(text="pong")
+    if event != "push":
+        return web.Response(status=202, text=f"Ignored {event} event")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return web.Response(status=400, text="Invalid JSON")
+
+    spawn(process_push(payload))
+    return web.Response(status=202, text="Accepted")
+
+async def start_webhook_server():
+    if not WEBHOOK_PORT:
+        return None
+    if not WEBHOOK_SECRET:
+        print("ERROR: webhook_port is set but webhook_secret is not, GitHub webhook receiver disabled")
+        return None
+
+    app = web.Application()
+    app.router.add_post("/github/webhook", handle_github_webhook)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, int(WEBHOOK_PORT))
+    await site.start()
+    print(f"GitHub webhook receiver listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}/github/webhook")
+    return runner
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    started_at = interaction.extras.get("started_at")
+    if started_at is not None:
+        metrics.observe("jambot_command_seconds", time.perf_counter() - started_at, command=command.name)
+
+def collect_gauges():
+    stats = github.cache_stats()
+    metrics.set("jambot_cache_hit_ratio", stats["hit_rate"] / 100, cache="github")
+    metrics.set("jambot_cache_entries", stats["entries"], cache="github")
+    metrics.set("jambot_teams", len(team_registry.by_name))
+    metrics.set("jambot_reminders_pending", len(reminder_scheduler.heap))
+    metrics.set("jambot_polls_open", len(poll_engine.polls))
+
+async def handle_metrics(request: web.Request):
+    collect_gauges()
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8", headers={"X-Content-Type-Options": "nosniff"})
+
+async def start_metrics_server():
+    if not METRICS_PORT:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, METRICS_HOST, int(METRICS_PORT))
+    await site.start()
+    print(f"Metrics endpoint listening on {METRICS_HOST}:{METRICS_PORT}/metrics")
+    return runner
+
+def summarize_histograms(name: str, label: str, top: int = 8):
+    rows = []
+    with metrics.lock:
+        for (metric, labels), histogram in metrics.histograms.items():
+            if metric == name and histogram.count:
+                value = dict(labels).get(label, "-") if label else "all"
+                rows.append((histogram.sum, value, histogram))
+    rows.sort(key=lambda row: row[0], reverse=True)
+    lines = [
+        f"`{value}` {histogram.count}× avg {histogram.sum / histogram.count * 1000:.0f}ms p95≤{histogram.quantile(0.95) * 1000:.0f}ms"
+        for _, value, histogram in rows[:top]
+    ]
+    return "\n".join(lines) or "No data yet"
+
+@bot.tree.command(name="stats", description="Show bot latency, API call and cache statistics", guild=discord.Object(id=serverid))
+async def stats(interaction: discord.Interaction):
+    has_permission = await check_permission(interaction)
+
+    if not has_permission:
+        await interaction.response.send_message("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
+        return
+
+    collect_gauges()
+    embed = discord.Embed(
+        title="Bot Statistics",
+        description="Sorted by total time spent",
+        color=0x3498db,
+        timestamp=discord.utils.utcnow()
+    )
+    embed.add_field(name="Slash commands", value=summarize_histograms("jambot_command_seconds", "command"), inline=False)
+    embed.add_field(name="Discord REST", value=summarize_histograms("jambot_discord_request_seconds", "route"), inline=False)
+    embed.add_field(name="Discord rate-limit waits", value=summarize_histograms("jambot_discord_bucket_wait_seconds", "route"), inline=False)
+    embed.add_field(name="MongoDB", value=summarize_histograms("jambot_mongo_command_seconds", "command"), inline=False)
+    embed.add_field(name="GitHub", value=summarize_histograms("jambot_github_request_seconds", "endpoint"), inline=False)
+    embed.add_field(name="Watcher sweeps", value=summarize_histograms("jambot_watch_sweep_seconds", None), inline=False)
+
+    with metrics.lock:
+        rate_limited = sum(v for (name, _), v in metrics.counters.items() if name == "jambot_discord_rate_limited_total")
+        rate_wait = sum(v for (name, _), v in metrics.counters.items() if name == "jambot_discord_rate_limit_wait_seconds_total")
+        github_wait = sum(v for (name, _), v in metrics.counters.items() if name == "jambot_github_rate_limit_wait_seconds_total")
+        bucket_wait = sum(h.sum for (name, _), h in metrics.histograms.items() if name == "jambot_discord_bucket_wait_seconds")
+        errors = {}
+        for (name, labels), value in metrics.counters.items():
+            if name == "jambot_errors_total":
+                source = dict(labels).get("source", "-")
+                errors[source] = errors.get(source, 0) + value
+    cache = github.cache_stats()
+    embed.add_field(
+        name="Rate limits & caches",
+        value=(
+            f"Discord 429s: {rate_limited:.0f} ({rate_wait:.1f}s Retry-After), {bucket_wait:.1f}s waiting on buckets in total\n"
+            f"GitHub quota left: {github.rate_remaining if github.rate_remaining is not None else '?'} ({github_wait:.0f}s of polling deferred)\n"
+            f"GitHub cache: {cache['hit_rate']:.1f}% hits ({cache['hits']}/{cache['hits'] + cache['misses']})"
+        ),
+        inline=False
+    )
+    embed.add_field(name="Errors", value=", ".join(f"{source}: {count:.0f}" for source, count in sorted(errors.items())) or "None", inline=False)
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="createteam", description="Create a new team with role and data", guild=discord.Object(id=serverid))
 @app_commands.describe(
@@ -370,8 +1451,11 @@ async def createteam(interaction: discord.Interaction, name: str, color: str = N
             "status": status or ''
         }
         await roles_collection.insert_one(role_data)
+        team_registry.put(role_data)
         
         await interaction.followup.send(f'✓ Successfully created team "{name}" with role and data!')
+    except DuplicateKeyError:
+        await interaction.followup.send(f'✓ Created role "{name}", but team data for "{name}" already exists in the database. Use `/updateteam` to change it.', ephemeral=True)
     except discord.Forbidden:
         await interaction.followup.send("I don't have permission to create roles. Please check my role permissions.", ephemeral=True)
     except Exception as e:
@@ -380,14 +1464,18 @@ async def createteam(interaction: discord.Interaction, name: str, color: str = N
 
 @bot.tree.command(name="setup", description="Bulk setup operations for teams", guild=discord.Object(id=serverid))
 @app_commands.describe(
-    action="What to setup: channels, roles, or both"
+    action="What to setup: channels, roles, or both",
+    mode="Apply changes, or only show what would change (plan)"
 )
 @app_commands.choices(action=[
     app_commands.Choice(name="Channels (text & voice)", value="channels"),
     app_commands.Choice(name="Roles (assign to members)", value="roles"),
     app_commands.Choice(name="Both (channels & roles)", value="both")
+], mode=[
+    app_commands.Choice(name="Apply", value="apply"),
+    app_commands.Choice(name="Plan (dry run)", value="plan")
 ])
-async def setup(interaction: discord.Interaction, action: app_commands.Choice[str]):
+async def setup(interaction: discord.Interaction, action: app_commands.Choice[str], mode: app_commands.Choice[str] = None):
     has_permission = await check_permission(interaction)
 
     if not has_permission:
@@ -398,15 +1486,106 @@ async def setup(interaction: discord.Interaction, action: app_commands.Choice[st
 
     guild = interaction.guild
     action_value = action.value
+    plan = mode is not None and mode.value == "plan"
 
     if action_value in ["channels", "both"]:
-        await setup_channels(interaction, guild)
+        await setup_channels(interaction, guild, plan=plan)
     
     if action_value in ["roles", "both"]:
-        await setup_roles(interaction, guild)
-
-async def setup_channels(interaction: discord.Interaction, guild: discord.Guild):
+        if plan:
+            await interaction.followup.send("Plan mode only covers channels, skipping role assignment.")
+        else:
+            await setup_roles(interaction, guild)
+
+SETUP_CREATE_CONCURRENCY = int(os.getenv("setup_create_concurrency", "2"))
+SETUP_EDIT_CONCURRENCY = int(os.getenv("setup_edit_concurrency", "8"))
+PROGRESS_INTERVAL = float(os.getenv("progress_interval", "3"))
+
+class ProgressMessage:
+    def __init__(self, interaction: discord.Interaction | None, label: str, total: int, ephemeral: bool = False, edit_original: bool = False):
+        self.interaction = interaction
+        self.label = label
+        self.total = total
+        self.ephemeral = ephemeral
+        self.edit_original = edit_original
+        self.done = 0
+        self.message = None
+        self.started = False
+        self.last_edit = 0.0
+
+    def text(self):
+        return f"{self.label}: {self.done}/{self.total}"
+
+    async def start(self):
+        if self.interaction is None:
+            return
+        if self.edit_original:
+            self.started = True
+            await self.update()
+            return
+        try:
+            self.message = await self.interaction.followup.send(self.text(), ephemeral=self.ephemeral, wait=True)
+            self.started = True
+        except discord.HTTPException as e:
+            print(f"Error sending progress message: {e}")
+        self.last_edit = time.monotonic()
+
+    async def update(self):
+        self.last_edit = time.monotonic()
+        try:
+            if self.edit_original:
+                await self.interaction.edit_original_response(content=self.text())
+            else:
+                await self.message.edit(content=self.text())
+        except discord.HTTPException as e:
+            print(f"Error updating progress message: {e}")
+
+    async def advance(self, count: int = 1):
+        self.done += count
+        if self.started and time.monotonic() - self.last_edit >= PROGRESS_INTERVAL:
+            await self.update()
+
+    async def finish(self):
+        if self.started:
+            await self.update()
+
+def by_name(items):
+    index = {}
+    for item in items:
+        index.setdefault(item.name, item)
+    return index
+
+def overwrite_target_name(target):
+    if isinstance(target, discord.Role) and target.is_default():
+        return "@everyone"
+    return getattr(target, "name", None) or str(target.id)
+
+def overwrite_diff(channel, desired: dict):
+    actual = {target.id: (target, overwrite) for target, overwrite in channel.overwrites.items()}
+    changes = []
+    for target, overwrite in desired.items():
+        current = actual.pop(target.id, None)
+        if current is None:
+            changes.append((target, overwrite, "missing"))
+        elif current[1].pair() != overwrite.pair():
+            changes.append((target, overwrite, "changed"))
+    for target, _ in actual.values():
+        changes.append((target, None, "extra"))
+    return changes
+
+def format_plan(lines: list[str], limit: int = 1800):
+    text = ""
+    for i, line in enumerate(lines):
+        if len(text) + len(line) + 1 > limit:
+            return text + f"… and {len(lines) - i} more"
+        text += line + "\n"
+    return text
+
+async def setup_channels(interaction: discord.Interaction, guild: discord.Guild, plan: bool = False):
     category = discord.utils.get(guild.categories, name="CodeJam-v6")
+    if not category and plan:
+        await interaction.followup.send("Plan: would create category 'CodeJam-v6' and every team channel in it.")
+        return
     if not category:
         try:
             category = await guild.create_category("CodeJam-v6")
@@ -415,11 +1594,15 @@ async def setup_channels(interaction: discord.Interaction, guild: discord.Guild)
             await interaction.followup.send("I don't have permission to create categories.")
             return
 
-    ct25_role = discord.utils.get(guild.roles, name="CT25")
-    ct26_role = discord.utils.get(guild.roles, name="CT26")
+    roles = by_name(guild.roles)
+    text_channels = by_name(category.text_channels)
+    voice_channels = by_name(category.voice_channels)
+
+    ct25_role = roles.get("CT25")
+    ct26_role = roles.get("CT26")
 
     try:
-        all_teams = await roles_collection.find({}).to_list(length=100)
+        all_teams = await team_registry.all()
     except Exception as e:
         await interaction.followup.send(f"Error fetching teams from database: {e}")
         return
@@ -428,23 +1611,20 @@ async def setup_channels(interaction: discord.Interaction, guild: discord.Guild)
         await interaction.followup.send("No teams found in database.")
         return
 
-    text_created = 0
-    text_updated = 0
-    text_skipped = 0
-    voice_created = 0
-    voice_updated = 0
-    voice_skipped = 0
+    counts = {
+        "text": {"created": 0, "updated": 0, "skipped": 0},
+        "voice": {"created": 0, "updated": 0, "skipped": 0},
+    }
+    operations = []
 
     for team_data in all_teams:
         team_name = team_data['name']
 
-        team_role = discord.utils.get(guild.roles, name=team_name)
+        team_role = roles.get(team_name)
         if not team_role:
             print(f"Role '{team_name}' not found, skipping channel creation")
             continue
 
-        channel_name = team_name
-
         overwrites = {
             guild.default_role: discord.PermissionOverwrite(read_messages=False, view_channel=False),
             team_role: discord.PermissionOverwrite(read_messages=True, send_messages=True, view_channel=True, connect=True, speak=True),
@@ -464,72 +1644,84 @@ async def setup_channels(interaction: discord.Interaction, guild: discord.Guild)
         if ct26_role:
             overwrites[ct26_role] = discord.PermissionOverwrite(read_messages=True, send_messages=True, view_channel=True, connect=True, speak=True)
 
-        existing_text = discord.utils.get(category.text_channels, name=channel_name)
-
-        if existing_text:
-
-            needs_update = len(existing_text.overwrites) != len(overwrites)
+        for kind, channel_name, existing in (
+            ("text", team_name, text_channels.get(team_name)),
+            ("voice", f"{team_name} Voice", voice_channels.get(f"{team_name} Voice")),
+        ):
+            if not existing:
+                operations.append(("create", kind, channel_name, None, overwrites, None))
+                continue
+            changes = overwrite_diff(existing, overwrites)
+            if changes:
+                operations.append(("edit", kind, channel_name, existing, overwrites, changes))
+            else:
+                counts[kind]["skipped"] += 1
 
-            if needs_update:
-                try:
-                    await existing_text.edit(overwrites=overwrites)
-                    text_updated += 1
-                except Exception as e:
-                    print(f"Error updating text permissions for {channel_name}: {e}")
+    if plan:
+        lines = []
+        for action, kind, channel_name, _, _, changes in operations:
+            if action == "create":
+                lines.append(f"+ create {kind} channel `{channel_name}`")
             else:
-                text_skipped += 1
+                details = ", ".join(f"{overwrite_target_name(target)} ({reason})" for target, _, reason in changes)
+                lines.append(f"~ update {kind} channel `{channel_name}`: {details}")
+        if not lines:
+            await interaction.followup.send(f"✓ Plan: all {counts['text']['skipped'] + counts['voice']['skipped']} team channels are already up to date.")
         else:
+            await interaction.followup.send(f"**Plan ({len(lines)} change(s)):**\n" + format_plan(lines))
+        return
 
-            try:
-                await guild.create_text_channel(
-                    name=channel_name,
-                    category=category,
-                    overwrites=overwrites,
-                    reason=f"Team text channel created by {interaction.user.name}"
-                )
-                text_created += 1
-                print(f"Created text channel: #{channel_name}")
-            except Exception as e:
-                print(f"Error creating text channel for {team_name}: {e}")
-
-        voice_channel_name = f"{team_name} Voice"
-        existing_voice = discord.utils.get(category.voice_channels, name=voice_channel_name)
-
-        if existing_voice:
-
-            needs_update = len(existing_voice.overwrites) != len(overwrites)
+    create_semaphore = asyncio.Semaphore(SETUP_CREATE_CONCURRENCY)
+    edit_semaphore = asyncio.Semaphore(SETUP_EDIT_CONCURRENCY)
+    progress = ProgressMessage(interaction, "Setting up channels", len(operations))
+    if operations:
+        await progress.start()
 
-            if needs_update:
-                try:
-                    await existing_voice.edit(overwrites=overwrites)
-                    voice_updated += 1
-                except Exception as e:
-                    print(f"Error updating voice permissions for {voice_channel_name}: {e}")
+    async def run(operation):
+        action, kind, channel_name, existing, overwrites, changes = operation
+        try:
+            if action == "edit":
+                async with edit_semaphore:
+                    if len(changes) == 1:
+                        target, overwrite, _ = changes[0]
+                        await existing.set_permissions(target, overwrite=overwrite)
+                    else:
+                        await existing.edit(overwrites=overwrites)
+                counts[kind]["updated"] += 1
             else:
-                voice_skipped += 1
-        else:
+                create = guild.create_text_channel if kind == "text" else guild.create_voice_channel
+                async with create_semaphore:
+                    await create(
+                        name=channel_name,
+                        category=category,
+                        overwrites=overwrites,
+                        reason=f"Team {kind} channel created by {interaction.user.name}"
+                    )
+                counts[kind]["created"] += 1
+                print(f"Created {kind} channel: {channel_name}")
+        except Exception as e:
+            print(f"Error during {action} of {kind} channel {channel_name}: {e}")
+            metrics.inc("jambot_errors_total", source="setup_channels", operation=f"{action}_{kind}")
+        await progress.advance()
 
-            try:
-                await guild.create_voice_channel(
-                    name=voice_channel_name,
-                    category=category,
-                    overwrites=overwrites,
-                    reason=f"Team voice channel created by {interaction.user.name}"
-                )
-                voice_created += 1
-                print(f"Created voice channel: {voice_channel_name}")
-            except Exception as e:
-                print(f"Error creating voice channel for {team_name}: {e}")
+    await asyncio.gather(*(run(operation) for operation in operations))
+    if operations:
+        await progress.finish()
 
+    text_counts, voice_counts = counts["text"], counts["voice"]
     summary = f"✓ Channel setup complete!\n\n"
-    summary += f"**Text Channels:**\n• Created: {text_created}\n• Updated: {text_updated}\n• Skipped: {text_skipped}\n\n"
-    summary += f"**Voice Channels:**\n• Created: {voice_created}\n• Updated: {voice_updated}\n• Skipped: {voice_skipped}"
+    summary += f"**Text Channels:**\n• Created: {text_counts['created']}\n• Updated: {text_counts['updated']}\n• Skipped: {text_counts['skipped']}\n\n"
+    summary += f"**Voice Channels:**\n• Created: {voice_counts['created']}\n• Updated: {voice_counts['updated']}\n• Skipped: {voice_counts['skipped']}"
 
     await interaction.followup.send(summary)
 
+SETUP_ROLE_CONCURRENCY = int(os.getenv("setup_role_concurrency", "5"))
+CHECKPOINT_BATCH = int(os.getenv("setup_checkpoint_batch", "50"))
+CHECKPOINT_TTL = float(os.getenv("setup_checkpoint_ttl", "3600"))
+
 async def setup_roles(interaction: discord.Interaction, guild: discord.Guild):
     try:
-        all_teams = await roles_collection.find({}).to_list(length=100)
+        all_teams = await team_registry.all()
 
         if not all_teams:
             await interaction.followup.send("No teams found in database.")
@@ -538,53 +1730,130 @@ async def setup_roles(interaction: discord.Interaction, guild: discord.Guild):
         roles_created = 0
         roles_existing = 0
         members_assigned = 0
+        members_skipped = 0
         errors = 0
 
+        roles = by_name(guild.roles)
+        team_roles = {}
+        missing = []
         for team_data in all_teams:
             team_name = team_data['name']
+            if team_name in roles:
+                team_roles[team_name] = roles[team_name]
+                roles_existing += 1
+            else:
+                missing.append(team_name)
 
-            role = discord.utils.get(guild.roles, name=team_name)
+        create_semaphore = asyncio.Semaphore(SETUP_CREATE_CONCURRENCY)
 
-            if not role:
-                try:
-                    role = await guild.create_role(
-                        name=team_name,
-                        color=discord.Color.orange(),
-                        mentionable=True,
-                        reason="Auto-created by setup command"
-                    )
-                    roles_created += 1
-                    print(f"Created role: {team_name}")
-                except Exception as e:
-                    print(f"Error creating role {team_name}: {e}")
-                    errors += 1
-                    continue
+        async def create_role(team_name):
+            async with create_semaphore:
+                return await guild.create_role(
+                    name=team_name,
+                    color=discord.Color.orange(),
+                    mentionable=True,
+                    reason="Auto-created by setup command"
+                )
+
+        created = await asyncio.gather(*(create_role(team_name) for team_name in missing), return_exceptions=True)
+        for team_name, result in zip(missing, created):
+            if isinstance(result, Exception):
+                print(f"Error creating role {team_name}: {result}")
+                errors += 1
             else:
-                roles_existing += 1
+                team_roles[team_name] = result
+                roles_created += 1
+                print(f"Created role: {team_name}")
+
+        checkpoint_id = f"roles:{guild.id}"
+        checkpoint = await setup_checkpoints_collection.find_one({"_id": checkpoint_id})
+        if checkpoint:
+            started_at = checkpoint.get("started_at")
+            if started_at and started_at.tzinfo is None:
+                started_at = started_at.replace(tzinfo=timezone.utc)
+            if not started_at or discord.utils.utcnow() - started_at > timedelta(seconds=CHECKPOINT_TTL):
+                await setup_checkpoints_collection.delete_one({"_id": checkpoint_id})
+                checkpoint = None
+        done = set(checkpoint.get("done", [])) if checkpoint else set()
+
+        pending: dict[int, tuple[discord.Member, list[discord.Role], list[str]]] = {}
+        members = team_members_collection.find(
+            {"team_name": {"$in": list(team_roles)}},
+            {"_id": 0, "team_name": 1, "discord_id": 1}
+        ).batch_size(MONGO_BATCH_SIZE)
+
+        async for member_data in members:
+            key = f"{member_data['team_name']}:{member_data['discord_id']}"
+            if key in done:
+                members_skipped += 1
+                continue
+            try:
+                discord_member = guild.get_member(int(member_data['discord_id']))
+            except ValueError:
+                discord_member = None
+            if not discord_member:
+                print(f"Member {member_data['discord_id']} not found in guild")
+                continue
+
+            role = team_roles[member_data['team_name']]
+            if discord_member.get_role(role.id):
+                members_skipped += 1
+                continue
+            entry = pending.setdefault(discord_member.id, (discord_member, [], []))
+            entry[1].append(role)
+            entry[2].append(key)
+
+        unsaved: list[str] = []
+
+        async def save_checkpoint():
+            if not unsaved:
+                return
+            batch = unsaved[:]
+            unsaved.clear()
+            await setup_checkpoints_collection.update_one(
+                {"_id": checkpoint_id},
+                {"$addToSet": {"done": {"$each": batch}}, "$set": {"updated_at": discord.utils.utcnow()}, "$setOnInsert": {"started_at": discord.utils.utcnow()}},
+                upsert=True
+            )
 
-            team_members = await team_members_collection.find({"team_name": team_name}).to_list(length=100)
+        role_semaphore = asyncio.Semaphore(SETUP_ROLE_CONCURRENCY)
+        progress = ProgressMessage(interaction, "Assigning roles", len(pending))
+        if pending:
+            await progress.start()
 
-            for member_data in team_members:
-                discord_member = guild.get_member(int(member_data['discord_id']))
+        async def assign(discord_member, member_roles, keys):
+            nonlocal members_assigned, errors
+            try:
+                async with role_semaphore:
+                    await discord_member.add_roles(*member_roles, reason="Assigned by setup command")
+                members_assigned += 1
+                print(f"Assigned {', '.join(r.name for r in member_roles)} to {discord_member.name}")
+                unsaved.extend(keys)
+                if len(unsaved) >= CHECKPOINT_BATCH:
+                    await save_checkpoint()
+            except Exception as e:
+                print(f"Error assigning role to {discord_member.name}: {e}")
+                metrics.inc("jambot_errors_total", source="setup_roles", operation="add_roles")
+                errors += 1
+            await progress.advance()
 
-                if discord_member:
-                    if role not in discord_member.roles:
-                        try:
-                            await discord_member.add_roles(role, reason="Assigned by setup command")
-                            members_assigned += 1
-                            print(f"Assigned {team_name} to {discord_member.name}")
-                        except Exception as e:
-                            print(f"Error assigning role to {discord_member.name}: {e}")
-                            errors += 1
-                else:
-                    print(f"Member {member_data['discord_id']} not found in guild")
+        try:
+            await asyncio.gather(*(assign(*entry) for entry in pending.values()))
+        finally:
+            await save_checkpoint()
+        if pending:
+            await progress.finish()
+
+        if errors == 0:
+            await setup_checkpoints_collection.delete_one({"_id": checkpoint_id})
 
         summary = f"✓ Role assignment complete!\n\n"
         summary += f"**Roles Created:** {roles_created}\n"
         summary += f"**Roles Already Existed:** {roles_existing}\n"
         summary += f"**Members Assigned:** {members_assigned}\n"
+        summary += f"**Already Assigned:** {members_skipped}\n"
         if errors > 0:
-            summary += f"**Errors:** {errors}\n"
+            summary += f"**Errors:** {errors} (run `/setup action:roles` again to retry, finished members are skipped)\n"
 
         await interaction.followup.send(summary)
 
@@ -592,6 +1861,278 @@ async def setup_roles(interaction: discord.Interaction, guild: discord.Guild):
         print(f'Error in setup_roles: {e}')
         await interaction.followup.send(f"An error occurred: {e}")
 
+IMPORT_BATCH = int(os.getenv("import_batch", "500"))
+IMPORT_MAX_BYTES = 10 * 1024 * 1024
+
+def import_records(filename: str, data: bytes):
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        yield from csv.DictReader(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline=""))
+    elif extension in ("ndjson", "jsonl"):
+        for line in io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig"):
+            if line.strip():
+                yield json.loads(line)
+    elif extension == "json":
+        parsed = json.loads(data.decode("utf-8-sig"))
+        if isinstance(parsed, dict):
+            yield from parsed.get("teams", [])
+            yield from parsed.get("members", [])
+        else:
+            for team in parsed:
+                members = team.pop("members", [])
+                yield team
+                for member in members:
+                    yield {"team_name": team.get("name"), **member}
+    else:
+        raise ValueError("Unsupported file type, use .csv, .json, .ndjson or .jsonl")
+
+@bot.tree.command(name="importteams", description="Bulk import teams and members from a CSV/JSON file", guild=discord.Object(id=serverid))
+@app_commands.describe(
+    file="CSV, JSON or NDJSON file with teams (name, githubRepo, githubUsernames, status) and/or members (team_name, discord_id, ...)",
+    create_roles="Create missing Discord roles for imported teams (default: yes)"
+)
+async def importteams(interaction: discord.Interaction, file: discord.Attachment, create_roles: bool = True):
+    has_permission = await check_permission(interaction)
+
+    if not has_permission:
+        await interaction.response.send_message("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
+        return
+
+    if file.size > IMPORT_MAX_BYTES:
+        await interaction.response.send_message("File is too large (10 MB max).", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+
+    guild = interaction.guild
+    roles = by_name(guild.roles)
+    previous_repos = {team["name"]: team.get("githubRepo", "") for team in await team_registry.all()}
+    imported_teams = set()
+    team_ops = []
+    repo_changes = set()
+    member_ops = []
+    unknown_members = []
+    problems = []
+    teams_written = 0
+    members_written = 0
+
+    def invalid_team(name: str):
+        if name in ("ct25", "ct26", "@everyone"):
+            return "reserved name"
+        role = roles.get(name)
+        if role and (role.managed or role >= guild.me.top_role):
+            return "existing role is managed or above the bot's role"
+        return None
+
+    async def flush_teams():
+        nonlocal team_ops, teams_written
+        if team_ops:
+            await roles_collection.bulk_write(team_ops, ordered=False)
+            teams_written += len(team_ops)
+            team_ops = []
+        for team_name in repo_changes:
+            await forget_commits(team_name)
+        repo_changes.clear()
+
+    async def flush_members():
+        nonlocal member_ops, members_written
+        if member_ops:
+            await team_members_collection.bulk_write(member_ops, ordered=False)
+            members_written += len(member_ops)
+            member_ops = []
+
+    try:
+        data = await file.read()
+        for line, record in enumerate(import_records(file.filename, data), start=1):
+            team_name = str(record.get("name") or "").strip().lower()
+            member_team = str(record.get("team_name") or team_name).strip().lower()
+            if not member_team:
+                problems.append(f"Record {line}: missing team name")
+                continue
+            reasons = {name: invalid_team(name) for name in (team_name, member_team) if name}
+            invalid = {name: reason for name, reason in reasons.items() if reason}
+            if invalid:
+                problems.extend(f"Record {line}: team `{name}` {reason}" for name, reason in invalid.items())
+                continue
+
+            if team_name:
+                fields = {}
+                if record.get("githubRepo"):
+                    fields["githubRepo"] = str(record["githubRepo"]).strip()
+                    if team_name in previous_repos and fields["githubRepo"] != previous_repos[team_name]:
+                        repo_changes.add(team_name)
+                if record.get("githubUsernames"):
+                    usernames = record["githubUsernames"]
+                    if isinstance(usernames, str):
+                        usernames = usernames.split(",")
+                    fields["githubUsernames"] = [username.strip() for username in usernames if username.strip()]
+                if record.get("status"):
+                    fields["status"] = str(record["status"]).strip()
+                defaults = {"githubRepo": "", "githubUsernames": [], "status": ""}
+                update = {"$setOnInsert": {k: v for k, v in defaults.items() if k not in fields}}
+                if fields:
+                    update["$set"] = fields
+                team_ops.append(UpdateOne({"name": team_name}, update, upsert=True))
+                imported_teams.add(team_name)
+
+            discord_id = str(record.get("discord_id") or "").strip()
+            if discord_id:
+                if not discord_id.isdigit():
+                    problems.append(f"Record {line}: invalid discord_id `{discord_id}`")
+                    continue
+                member_fields = {k: str(record[k]) for k in ("discord_username", "discord_display_name") if record.get(k)}
+                member_update = {"$set": member_fields} if member_fields else {"$setOnInsert": {"discord_username": discord_id}}
+                operation = UpdateOne({"team_name": member_team, "discord_id": discord_id}, member_update, upsert=True)
+                if member_team in previous_repos or member_team in imported_teams:
+                    member_ops.append(operation)
+                else:
+                    unknown_members.append((member_team, discord_id, operation))
+
+            if len(team_ops) >= IMPORT_BATCH:
+                await flush_teams()
+            if len(member_ops) >= IMPORT_BATCH:
+                await flush_teams()
+                await flush_members()
+        await flush_teams()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        await interaction.followup.send(f"Could not read `{file.filename}`: {e}", ephemeral=True)
+        return
+    except Exception as e:
+        print(f'Error importing teams: {e}')
+        await interaction.followup.send(f"An error occurred while importing teams: {e}", ephemeral=True)
+        return
+
+    try:
+        for team_name, discord_id, operation in unknown_members:
+            if team_name not in imported_teams:
+                problems.append(f"Member {discord_id}: team `{team_name}` does not exist")
+                continue
+            member_ops.append(operation)
+            if len(member_ops) >= IMPORT_BATCH:
+                await flush_members()
+        await flush_members()
+    except Exception as e:
+        print(f'Error importing members: {e}')
+        problems.append(f"Error writing members: {e}")
+
+    await team_registry.load()
+
+    roles_created = 0
+    if create_roles:
+        missing = [team_name for team_name in sorted(imported_teams) if team_name not in roles]
+        create_semaphore = asyncio.Semaphore(SETUP_CREATE_CONCURRENCY)
+
+        progress = ProgressMessage(interaction, "Creating roles", len(missing), ephemeral=True)
+        if missing:
+            await progress.start()
+
+        async def create_role(team_name):
+            try:
+                async with create_semaphore:
+                    return await guild.create_role(name=team_name, mentionable=True, reason=f"Imported by {interaction.user.name}")
+            finally:
+                await progress.advance()
+
+        results = await asyncio.gather(*(create_role(team_name) for team_name in missing), return_exceptions=True)
+        for team_name, result in zip(missing, results):
+            if isinstance(result, Exception):
+                problems.append(f"Could not create role `{team_name}`: {result}")
+            else:
+                roles_created += 1
+        if missing:
+            await progress.finish()
+
+    summary = f"✓ Import of `{file.filename}` complete!\n\n"
+    summary += f"**Teams Upserted:** {teams_written}\n"
+    summary += f"**Members Upserted:** {members_written}\n"
+    summary += f"**Roles Created:** {roles_created}\n"
+    if problems:
+        summary += f"**Problems ({len(problems)}):**\n" + format_plan(problems, limit=1200)
+    else:
+        summary += "Run `/setup action:both` to create channels and assign roles."
+    await interaction.followup.send(summary, ephemeral=True)
+
+EXPORT_MAX_BYTES = int(os.getenv("export_max_bytes", str(8 * 1024 * 1024)))
+EXPORT_COLUMNS = ["team", "githubRepo", "githubUsernames", "status", "late_commits", "discord_id", "discord_username", "discord_display_name"]
+
+async def iter_teams_with_members():
+    members = team_members_collection.find(
+        {}, {"_id": 0, "team_name": 1, "discord_id": 1, "discord_username": 1, "discord_display_name": 1}
+    ).sort([("team_name", ASCENDING), ("discord_id", ASCENDING)]).batch_size(MONGO_BATCH_SIZE)
+    members = aiter(members)
+    member = await anext(members, None)
+
+    async for team in roles_collection.find({}, TEAM_FIELDS).sort("name", ASCENDING).batch_size(MONGO_BATCH_SIZE):
+        name = team.get("name", "")
+        while member is not None and member.get("team_name", "") < name:
+            member = await anext(members, None)
+        team_members = []
+        while member is not None and member.get("team_name") == name:
+            team_members.append(member)
+            member = await anext(members, None)
+        yield team, team_members
+
+async def write_export(fp, export_format: str):
+    late_counts = {
+        row["_id"]: row["count"]
+        async for row in commits_collection.aggregate([
+            {"$match": {"committed_at": {"$gt": limit}}},
+            {"$group": {"_id": "$team", "count": {"$sum": 1}}},
+        ])
+    }
+    teams = 0
+    with gzip.GzipFile(fileobj=fp, mode="wb") as gz, io.TextIOWrapper(gz, encoding="utf-8", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=EXPORT_COLUMNS) if export_format == "csv" else None
+        if writer:
+            writer.writeheader()
+        async for team, members in iter_teams_with_members():
+            teams += 1
+            row = {
+                "team": team.get("name", ""),
+                "githubRepo": team.get("githubRepo", ""),
+                "githubUsernames": team.get("githubUsernames", []),
+                "status": team.get("status", ""),
+                "late_commits": late_counts.get(team.get("name"), 0),
+            }
+            if writer:
+                row["githubUsernames"] = ",".join(row["githubUsernames"])
+                for member in members or [{}]:
+                    writer.writerow({**row, **{k: member.get(k, "") for k in ("discord_id", "discord_username", "discord_display_name")}})
+            else:
+                row["members"] = [{k: member.get(k, "") for k in ("discord_id", "discord_username", "discord_display_name")} for member in members]
+                out.write(json.dumps(row) + "\n")
+    return teams
+
+@bot.tree.command(name="export", description="Export teams, members and late-commit counts as a compressed file", guild=discord.Object(id=serverid))
+@app_commands.describe(export_format="File format")
+@app_commands.choices(export_format=[
+    app_commands.Choice(name="CSV (one row per member)", value="csv"),
+    app_commands.Choice(name="NDJSON (one line per team)", value="ndjson")
+])
+async def export(interaction: discord.Interaction, export_format: app_commands.Choice[str] = None):
+    has_permission = await check_permission(interaction)
+
+    if not has_permission:
+        await interaction.response.send_message("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+
+    file_format = export_format.value if export_format else "csv"
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as fp:
+            teams = await write_export(fp, file_format)
+            size = fp.tell()
+            if size > EXPORT_MAX_BYTES:
+                await interaction.followup.send(f"Export is {size / 1024 / 1024:.1f} MB, which is over the upload limit.", ephemeral=True)
+                return
+            fp.seek(0)
+            filename = f"teams-{discord.utils.utcnow():%Y%m%d-%H%M%S}.{file_format}.gz"
+            await interaction.followup.send(f"✓ Exported {teams} team(s).", file=discord.File(fp, filename=filename), ephemeral=True)
+    except Exception as e:
+        print(f'Error exporting teams: {e}')
+        await interaction.followup.send(f"An error occurred while exporting: {e}", ephemeral=True)
+
 @bot.tree.command(name="updateteam", description="Update existing team data", guild=discord.Object(id=serverid))
 @app_commands.describe(
     team_name="Team Name",
@@ -618,7 +2159,7 @@ async def updateteam(
     usernames_list = [username.strip() for username in github_usernames.split(',')] if github_usernames else []
 
     try:
-        existing_role_data = await roles_collection.find_one({"name": team_name})
+        existing_role_data = await team_registry.get(team_name)
 
         if not existing_role_data:
             await interaction.followup.send(f'Team "{team_name}" does not exist. Use `/createteam` to create it first.', ephemeral=True)
@@ -634,6 +2175,9 @@ async def updateteam(
 
         if update_fields:
             await roles_collection.update_one({"name": team_name}, {"$set": update_fields})
+            team_registry.update(team_name, update_fields)
+            if github_repo is not None and github_repo != existing_role_data.get("githubRepo"):
+                await forget_commits(team_name)
             await interaction.followup.send(f'Team data for "{team_name}" has been updated.')
         else:
             await interaction.followup.send("No fields to update. Please provide at least one parameter.", ephemeral=True)
@@ -641,6 +2185,75 @@ async def updateteam(
         print(f'Error updating team data: {error}')
         await interaction.followup.send("An error occurred while updating team data.")
 
+TEAMS_PAGE_SIZE = 10
+MEMBERS_PAGE_SIZE = 25
+PAGE_CACHE_TTL = float(os.getenv("page_cache_ttl", "120"))
+PAGE_VIEW_TIMEOUT = float(os.getenv("page_view_timeout", "600"))
+
+class PagedView(discord.ui.View):
+    def __init__(self, author_id: int, pages: int, render):
+        super().__init__(timeout=PAGE_VIEW_TIMEOUT)
+        self.author_id = author_id
+        self.pages = max(pages, 1)
+        self.render = render
+        self.page = 0
+        self.cache: dict[int, tuple[float, discord.Embed]] = {}
+        self.message = None
+
+    async def embed_for(self, page: int):
+        now = time.monotonic()
+        for cached_page in [p for p, (expires, _) in self.cache.items() if expires <= now]:
+            del self.cache[cached_page]
+
+        cached = self.cache.get(page)
+        if cached:
+            return cached[1]
+        embed = await self.render(page)
+        if self.pages > 1:
+            embed.set_footer(text=f"Page {page + 1}/{self.pages}")
+        self.cache[page] = (now + PAGE_CACHE_TTL, embed)
+        return embed
+
+    def update_buttons(self):
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+
+    async def send(self, interaction: discord.Interaction):
+        embed = await self.embed_for(0)
+        if self.pages == 1:
+            await interaction.response.send_message(embed=embed)
+            return
+        self.update_buttons()
+        await interaction.response.send_message(embed=embed, view=self)
+        self.message = await interaction.original_response()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran this command can change pages.", ephemeral=True)
+            return False
+        return True
+
+    async def show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.pages - 1))
+        self.update_buttons()
+        await interaction.response.edit_message(embed=await self.embed_for(self.page), view=self)
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show(interaction, self.page + 1)
+
+    async def on_timeout(self):
+        self.cache.clear()
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
 @bot.tree.command(name="teaminfo", description="View team information", guild=discord.Object(id=serverid))
 @app_commands.describe(
     view="What to view: specific team, all teams list, or team members",
@@ -656,31 +2269,40 @@ async def teaminfo(interaction: discord.Interaction, view: app_commands.Choice[s
     
     if view_value == "all":
         try:
-            all_roles = await roles_collection.find({}).to_list(length=100)
+            all_roles = await team_registry.all()
 
             if not all_roles:
                 await interaction.response.send_message("No teams found in the database.")
                 return
 
-            embed = discord.Embed(
-                title="All Teams",
-                description=f"Total teams: {len(all_roles)}",
-                color=0x3498db,
-                timestamp=discord.utils.utcnow()
-            )
+            names = [role_data['name'] for role_data in all_roles]
 
-            for role_data in all_roles:
-                status = role_data.get('status', 'No status')
-                repo = role_data.get('githubRepo', 'No repo')
-                members_count = len(role_data.get('githubUsernames', []))
-
-                embed.add_field(
-                    name=role_data['name'],
-                    value=f"Status: {status}\nRepo: {repo}\nMembers: {members_count}",
-                    inline=True
+            async def render(page: int):
+                embed = discord.Embed(
+                    title="All Teams",
+                    description=f"Total teams: {len(names)}",
+                    color=0x3498db,
+                    timestamp=discord.utils.utcnow()
                 )
 
-            await interaction.response.send_message(embed=embed)
+                for name in names[page * TEAMS_PAGE_SIZE:(page + 1) * TEAMS_PAGE_SIZE]:
+                    role_data = await team_registry.get(name)
+                    if not role_data:
+                        embed.add_field(name=name, value="Deleted", inline=True)
+                        continue
+                    status = role_data.get('status', 'No status')
+                    repo = role_data.get('githubRepo', 'No repo')
+                    members_count = len(role_data.get('githubUsernames', []))
+
+                    embed.add_field(
+                        name=role_data['name'],
+                        value=f"Status: {status}\nRepo: {repo}\nMembers: {members_count}",
+                        inline=True
+                    )
+                return embed
+
+            pages = -(-len(names) // TEAMS_PAGE_SIZE)
+            await PagedView(interaction.user.id, pages, render).send(interaction)
         except Exception as error:
             print(f'Error fetching team list: {error}')
             await interaction.response.send_message("An error occurred while fetching the team list.")
@@ -691,30 +2313,40 @@ async def teaminfo(interaction: discord.Interaction, view: app_commands.Choice[s
             return
         
         try:
-            members = await team_members_collection.find({"team_name": team_name}).to_list(length=100)
+            query = {"team_name": team_name}
+            total = await team_members_collection.count_documents(query)
 
-            if not members:
+            if not total:
                 await interaction.response.send_message(f'No members found for team "{team_name}".', ephemeral=True)
                 return
 
-            embed = discord.Embed(
-                title=f"Team: {team_name}",
-                description=f"Total members: {len(members)}",
-                color=0xff6a00,
-                timestamp=discord.utils.utcnow()
-            )
+            guild = interaction.guild
 
-            member_list = []
-            for mem in members:
-                discord_member = interaction.guild.get_member(int(mem['discord_id']))
-                if discord_member:
-                    member_list.append(f"• {discord_member.mention} ({discord_member.name})")
-                else:
-                    member_list.append(f"• {mem['discord_username']} (Not in server)")
+            async def render(page: int):
+                members = (
+                    team_members_collection.find(query, {"_id": 0, "discord_id": 1, "discord_username": 1})
+                    .sort("discord_id", ASCENDING)
+                    .skip(page * MEMBERS_PAGE_SIZE)
+                    .limit(MEMBERS_PAGE_SIZE)
+                )
 
-            embed.add_field(name="Members", value="\n".join(member_list) or "No members", inline=False)
+                member_list = []
+                async for mem in members:
+                    discord_member = guild.get_member(int(mem['discord_id']))
+                    if discord_member:
+                        member_list.append(f"• {discord_member.mention} ({discord_member.name})")
+                    else:
+                        member_list.append(f"• {mem.get('discord_username', mem['discord_id'])} (Not in server)")
+
+                return discord.Embed(
+                    title=f"Team: {team_name}",
+                    description=f"Total members: {total}\n\n" + ("\n".join(member_list) or "No members"),
+                    color=0xff6a00,
+                    timestamp=discord.utils.utcnow()
+                )
 
-            await interaction.response.send_message(embed=embed)
+            pages = -(-total // MEMBERS_PAGE_SIZE)
+            await PagedView(interaction.user.id, pages, render).send(interaction)
 
         except Exception as e:
             print(f'Error showing team members: {e}')
@@ -726,7 +2358,7 @@ async def teaminfo(interaction: discord.Interaction, view: app_commands.Choice[s
             return
         
         try:
-            role_data = await roles_collection.find_one({"name": team_name})
+            role_data = await team_registry.get(team_name)
 
             if not role_data:
                 await interaction.response.send_message(f'No data found for team "{team_name}".')
@@ -739,7 +2371,7 @@ async def teaminfo(interaction: discord.Interaction, view: app_commands.Choice[s
                 await interaction.response.send_message(f'Team "{team_name}" not found in this guild.')
                 return
 
-            members_with_role = [member for member in guild.members if role in member.roles]
+            members_with_role = role_members.members_of(guild, role)
             member_names = ', '.join([member.name for member in members_with_role]) or 'No members with this role.'
 
             github_repo_link = f"https://github.com/{role_data['githubRepo']}" if role_data.get('githubRepo') else None
@@ -768,6 +2400,100 @@ async def teaminfo(interaction: discord.Interaction, view: app_commands.Choice[s
             print(f'Error fetching team data: {error}')
             await interaction.response.send_message("An error occurred while fetching team data.")
 
+ANNOUNCE_CONCURRENCY = int(os.getenv("announce_concurrency", "10"))
+running_broadcasts = set()
+
+def announcement_embed(broadcast: dict):
+    created_at = broadcast["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    embed = discord.Embed(
+        title="Announcement",
+        description=broadcast["message"],
+        color=0xff6a00,
+        timestamp=created_at
+    )
+    embed.set_footer(text=f"Announced by {broadcast['author']}")
+    return embed
+
+async def run_broadcast(broadcast: dict, interaction: discord.Interaction | None = None):
+    broadcast_id = broadcast["_id"]
+    running_broadcasts.add(broadcast_id)
+    try:
+        embed = announcement_embed(broadcast)
+        pending = [
+            delivery["channel_id"]
+            async for delivery in deliveries_collection.find(
+                {"broadcast_id": broadcast_id, "state": "pending"}, {"_id": 0, "channel_id": 1}
+            ).batch_size(MONGO_BATCH_SIZE)
+        ]
+        progress = ProgressMessage(interaction, "Sending announcement", len(pending), edit_original=True)
+        if interaction is not None and len(pending) > 1:
+            await progress.start()
+
+        semaphore = asyncio.Semaphore(ANNOUNCE_CONCURRENCY)
+
+        async def deliver(channel_id: int):
+            channel = bot.get_channel(channel_id)
+            state, error = "sent", None
+            try:
+                if channel is None:
+                    raise LookupError("channel no longer exists")
+                async with semaphore:
+                    await channel.send(embed=embed)
+            except discord.Forbidden as e:
+                print(f'No permission to send to {getattr(channel, "name", channel_id)}')
+                state, error = "failed", str(e)
+            except Exception as e:
+                print(f'Error sending to {getattr(channel, "name", channel_id)}: {e}')
+                state, error = "failed", str(e)
+            if state == "failed":
+                metrics.inc("jambot_errors_total", source="announce", operation="send")
+            try:
+                await deliveries_collection.update_one(
+                    {"broadcast_id": broadcast_id, "channel_id": channel_id},
+                    {"$set": {"state": state, "error": error}}
+                )
+            except Exception as e:
+                print(f'Error saving delivery state for {channel_id}: {e}')
+                unsaved[state] += 1
+            await progress.advance()
+
+        unsaved = {"sent": 0, "failed": 0}
+        await asyncio.gather(*(deliver(channel_id) for channel_id in pending))
+        await progress.finish()
+
+        try:
+            counts = {
+                row["_id"]: row["count"]
+                async for row in deliveries_collection.aggregate([
+                    {"$match": {"broadcast_id": broadcast_id}},
+                    {"$group": {"_id": "$state", "count": {"$sum": 1}}},
+                ])
+            }
+        except Exception as e:
+            print(f'Error counting deliveries: {e}')
+            counts = {}
+        sent, failed = counts.get("sent", 0) + unsaved["sent"], counts.get("failed", 0) + unsaved["failed"]
+        await broadcasts_collection.update_one(
+            {"_id": broadcast_id},
+            {"$set": {"status": "done", "sent": sent, "failed": failed, "finished_at": discord.utils.utcnow()}}
+        )
+        return sent, failed
+    finally:
+        running_broadcasts.discard(broadcast_id)
+
+async def resume_broadcasts():
+    async for broadcast in broadcasts_collection.find({"guild_id": serverid, "status": "running"}):
+        if broadcast["_id"] in running_broadcasts:
+            continue
+        print(f'Resuming announcement {broadcast["_id"]} by {broadcast["author"]}')
+        try:
+            sent, failed = await run_broadcast(broadcast)
+            print(f'Announcement {broadcast["_id"]} finished: {sent}/{broadcast["total"]} sent, {failed} failed')
+        except Exception as e:
+            print(f'Error resuming announcement {broadcast["_id"]}: {e}')
+
 @bot.tree.command(name="announce", description="Send announcement to all text channels or specific channels", guild=discord.Object(id=serverid))
 @app_commands.describe(
     message="The announcement message",
@@ -799,25 +2525,207 @@ async def announce(interaction: discord.Interaction, message: str, channels: str
 
     await interaction.response.send_message(f"Sending announcement to {len(target_channels)} channel(s)...", ephemeral=True)
 
+    broadcast = {
+        "guild_id": guild.id,
+        "message": message,
+        "author": interaction.user.name,
+        "created_at": discord.utils.utcnow(),
+        "status": "running",
+        "total": len(target_channels),
+    }
+    try:
+        await broadcasts_collection.insert_one(broadcast)
+        await deliveries_collection.insert_many([
+            {"broadcast_id": broadcast["_id"], "channel_id": channel.id, "state": "pending"}
+            for channel in target_channels
+        ])
+    except Exception as e:
+        print(f'Error saving broadcast: {e}')
+        await interaction.followup.send(f"An error occurred: {e}", ephemeral=True)
+        return
+
+    sent, failed = await run_broadcast(broadcast, interaction)
+    summary = f"✓ Announcement sent to {sent}/{len(target_channels)} channels!"
+    if failed:
+        summary += f" {failed} failed."
+    await interaction.followup.send(summary, ephemeral=True)
+
+POLL_FLUSH_INTERVAL = float(os.getenv("poll_flush_interval", "10"))
+POLL_EDIT_INTERVAL = float(os.getenv("poll_edit_interval", "5"))
+EMOJI_NUMBERS = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
+
+def poll_embed(poll_data: dict, votes: dict):
+    counts = [0] * len(poll_data["options"])
+    for choice in votes.values():
+        counts[choice] += 1
+    total = sum(counts)
+
+    created_at = poll_data["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
     embed = discord.Embed(
-        title="Announcement",
-        description=message,
-        color=0xff6a00,
-        timestamp=discord.utils.utcnow()
+        title=f"{poll_data['question']}",
+        description="Click a button to vote! You can change your vote at any time." if poll_data.get("open", True) else "This poll is closed.",
+        color=0x00ff00,
+        timestamp=created_at
     )
-    embed.set_footer(text=f"Announced by {interaction.user.name}")
 
-    success_count = 0
-    for channel in target_channels:
+    for i, option in enumerate(poll_data["options"]):
+        share = counts[i] / total if total else 0
+        bar = "█" * round(share * 10) + "░" * (10 - round(share * 10))
+        embed.add_field(
+            name=f"{EMOJI_NUMBERS[i]} Option {i+1}",
+            value=f"{option}\n{bar} {counts[i]} vote(s) ({share:.0%})",
+            inline=False
+        )
+
+    status = "" if poll_data.get("open", True) else " • Closed"
+    embed.set_footer(text=f"Poll created by {poll_data['author']} • {total} vote(s){status}")
+    return embed
+
+class PollView(discord.ui.View):
+    def __init__(self, poll_id: str, options: list[str]):
+        super().__init__(timeout=None)
+        for i, option in enumerate(options):
+            button = discord.ui.Button(
+                label=f"{i+1}. {option}"[:80],
+                style=discord.ButtonStyle.primary,
+                custom_id=f"poll:{poll_id}:{i}",
+                row=i // 5
+            )
+            button.callback = self.make_callback(poll_id, i)
+            self.add_item(button)
+        close_button = discord.ui.Button(
+            label="Close poll",
+            style=discord.ButtonStyle.danger,
+            custom_id=f"poll:{poll_id}:close",
+            row=2
+        )
+        close_button.callback = self.close_callback(poll_id)
+        self.add_item(close_button)
+
+    @staticmethod
+    def make_callback(poll_id: str, choice: int):
+        async def callback(interaction: discord.Interaction):
+            await poll_engine.vote(interaction, poll_id, choice)
+        return callback
+
+    @staticmethod
+    def close_callback(poll_id: str):
+        async def callback(interaction: discord.Interaction):
+            await poll_engine.close(interaction, poll_id)
+        return callback
+
+class PollEngine:
+    def __init__(self, collection):
+        self.collection = collection
+        self.polls: dict[str, dict] = {}
+        self.votes: dict[str, dict[str, int]] = {}
+        self.dirty: dict[str, dict[str, int]] = {}
+        self.pending_edits: set[str] = set()
+        self.loaded = False
+
+    async def load(self):
+        if self.loaded:
+            return
+        async for poll_data in self.collection.find({"open": True}).batch_size(MONGO_BATCH_SIZE):
+            poll_id = str(poll_data["_id"])
+            self.register(poll_id, poll_data, poll_data.get("votes", {}))
+            bot.add_view(PollView(poll_id, poll_data["options"]), message_id=poll_data["message_id"])
+        self.loaded = True
+        print(f"Loaded {len(self.polls)} open poll(s)")
+
+    def register(self, poll_id: str, poll_data: dict, votes: dict):
+        self.polls[poll_id] = poll_data
+        self.votes[poll_id] = {user_id: int(choice) for user_id, choice in votes.items()}
+
+    async def vote(self, interaction: discord.Interaction, poll_id: str, choice: int):
+        poll_data = self.polls.get(poll_id)
+        if not poll_data:
+            await interaction.response.send_message("This poll is no longer active.", ephemeral=True)
+            return
+
+        user_id = str(interaction.user.id)
+        previous = self.votes[poll_id].get(user_id)
+        if previous == choice:
+            await interaction.response.send_message(f"You already voted for **{poll_data['options'][choice]}**.", ephemeral=True)
+            return
+
+        self.votes[poll_id][user_id] = choice
+        self.dirty.setdefault(poll_id, {})[user_id] = choice
+        await interaction.response.send_message(f"✓ Vote recorded for **{poll_data['options'][choice]}**.", ephemeral=True)
+        self.schedule_edit(poll_id)
+
+    async def close(self, interaction: discord.Interaction, poll_id: str):
+        poll_data = self.polls.get(poll_id)
+        if not poll_data:
+            await interaction.response.send_message("This poll is no longer active.", ephemeral=True)
+            return
+        if interaction.user.id != poll_data.get("author_id") and not await check_permission(interaction):
+            await interaction.response.send_message("Only the poll author or an admin can close this poll.", ephemeral=True)
+            return
+
+        votes = self.votes[poll_id]
         try:
-            await channel.send(embed=embed)
-            success_count += 1
-        except discord.Forbidden:
-            print(f'No permission to send to {channel.name}')
+            await self.collection.update_one(
+                {"_id": poll_data["_id"]},
+                {"$set": {"open": False, "closed_at": discord.utils.utcnow(), "votes": votes}}
+            )
+        except Exception as e:
+            print(f"Error closing poll: {e}")
+            await interaction.response.send_message("Could not close the poll, please try again.", ephemeral=True)
+            return
+
+        self.polls.pop(poll_id, None)
+        self.votes.pop(poll_id, None)
+        self.dirty.pop(poll_id, None)
+        poll_data["open"] = False
+        await interaction.response.edit_message(embed=poll_embed(poll_data, votes), view=None)
+
+    def schedule_edit(self, poll_id: str):
+        if poll_id not in self.pending_edits:
+            self.pending_edits.add(poll_id)
+            spawn(self.edit_after_delay(poll_id))
+
+    async def edit_after_delay(self, poll_id: str):
+        await asyncio.sleep(POLL_EDIT_INTERVAL)
+        self.pending_edits.discard(poll_id)
+        poll_data = self.polls.get(poll_id)
+        if not poll_data:
+            return
+        channel = bot.get_channel(poll_data["channel_id"])
+        if channel is None:
+            return
+        try:
+            await channel.get_partial_message(poll_data["message_id"]).edit(embed=poll_embed(poll_data, self.votes[poll_id]))
+        except discord.HTTPException as e:
+            print(f"Error updating poll results: {e}")
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, {}
+        operations = [
+            UpdateOne({"_id": self.polls[poll_id]["_id"]}, {"$set": {f"votes.{user_id}": choice for user_id, choice in votes.items()}})
+            for poll_id, votes in dirty.items()
+            if poll_id in self.polls
+        ]
+        if not operations:
+            return
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
         except Exception as e:
-            print(f'Error sending to {channel.name}: {e}')
+            print(f"Error saving poll votes: {e}")
+            for poll_id, votes in dirty.items():
+                newer = self.dirty.setdefault(poll_id, {})
+                for user_id, choice in votes.items():
+                    newer.setdefault(user_id, choice)
+
+poll_engine = PollEngine(polls_collection)
 
-    await interaction.followup.send(f"✓ Announcement sent to {success_count}/{len(target_channels)} channels!", ephemeral=True)
+@tasks.loop(seconds=POLL_FLUSH_INTERVAL)
+async def poll_flush_loop():
+    await poll_engine.flush()
 
 @bot.tree.command(name="poll", description="Create a poll with multiple options", guild=discord.Object(id=serverid))
 @app_commands.describe(
@@ -835,25 +2743,97 @@ async def poll(interaction: discord.Interaction, question: str, options: str):
         await interaction.response.send_message("Maximum 10 options allowed.", ephemeral=True)
         return
 
-    emoji_numbers = ['1️⃣', '2️⃣', '3️⃣', '4️⃣', '5️⃣', '6️⃣', '7️⃣', '8️⃣', '9️⃣', '🔟']
+    poll_data = {
+        "_id": ObjectId(),
+        "question": question,
+        "options": option_list,
+        "author": interaction.user.name,
+        "author_id": interaction.user.id,
+        "channel_id": interaction.channel_id,
+        "created_at": discord.utils.utcnow(),
+        "open": True,
+        "votes": {},
+    }
+    poll_id = str(poll_data["_id"])
 
-    embed = discord.Embed(
-        title=f"{question}",
-        description="React with the corresponding number to vote!",
-        color=0x00ff00,
-        timestamp=discord.utils.utcnow()
-    )
+    await interaction.response.send_message(embed=poll_embed(poll_data, {}), view=PollView(poll_id, option_list))
+    message = await interaction.original_response()
+    poll_data["message_id"] = message.id
 
-    for i, option in enumerate(option_list):
-        embed.add_field(name=f"{emoji_numbers[i]} Option {i+1}", value=option, inline=False)
+    try:
+        await polls_collection.insert_one(poll_data)
+    except Exception as e:
+        print(f'Error saving poll: {e}')
+        await interaction.edit_original_response(content="Could not save this poll, so it was cancelled. Please try again.", embed=None, view=None)
+        return
+    poll_engine.register(poll_id, poll_data, {})
+
+class ReminderScheduler:
+    def __init__(self, collection):
+        self.collection = collection
+        self.heap: list[tuple[float, object]] = []
+        self.wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def load(self):
+        heap = []
+        async for reminder in self.collection.find({"sent": False}, {"due_at": 1}).batch_size(MONGO_BATCH_SIZE):
+            heap.append((reminder["due_at"].replace(tzinfo=timezone.utc).timestamp(), reminder["_id"]))
+        heapq.heapify(heap)
+        self.heap = heap
+        self.wakeup.set()
+        print(f"Loaded {len(heap)} pending reminder(s)")
+
+    def add(self, due_at: datetime, reminder_id):
+        heapq.heappush(self.heap, (due_at.timestamp(), reminder_id))
+        if self.heap[0][1] == reminder_id:
+            self.wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self.wakeup.clear()
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+            delay = self.heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, reminder_id = heapq.heappop(self.heap)
+            spawn(self.fire(reminder_id))
+
+    async def fire(self, reminder_id):
+        try:
+            reminder = await self.collection.find_one_and_update(
+                {"_id": reminder_id, "sent": False},
+                {"$set": {"sent": True}}
+            )
+            if not reminder:
+                return
 
-    embed.set_footer(text=f"Poll created by {interaction.user.name}")
+            embed = discord.Embed(
+                title="# REMINDER",
+                description=reminder["message"],
+                color=0xff0000,
+                timestamp=discord.utils.utcnow()
+            )
+            embed.set_footer(text=f"Reminder for {reminder['user_name']}")
 
-    await interaction.response.send_message(embed=embed)
-    message = await interaction.original_response()
+            channel = bot.get_channel(reminder["channel_id"])
+            if channel is None:
+                channel = await bot.fetch_channel(reminder["channel_id"])
+            await channel.send(f"<@{reminder['user_id']}>", embed=embed)
+        except Exception as e:
+            print(f'Error sending reminder: {e}')
 
-    for i in range(len(option_list)):
-        await message.add_reaction(emoji_numbers[i])
+reminder_scheduler = ReminderScheduler(reminders_collection)
 
 @bot.tree.command(name="reminder", description="Set a reminder for a deadline", guild=discord.Object(id=serverid))
 @app_commands.describe(
@@ -870,22 +2850,25 @@ async def reminder(interaction: discord.Interaction, message: str, time_minutes:
         await interaction.response.send_message("Maximum reminder time is 7 days (10080 minutes).", ephemeral=True)
         return
 
-    await interaction.response.send_message(f"✓ Reminder set! I'll remind you in {time_minutes} minute(s).", ephemeral=True)
-
-    await asyncio.sleep(time_minutes * 60)
-
-    embed = discord.Embed(
-        title="# REMINDER",
-        description=message,
-        color=0xff0000,
-        timestamp=discord.utils.utcnow()
-    )
-    embed.set_footer(text=f"Reminder for {interaction.user.name}")
+    due_at = discord.utils.utcnow() + timedelta(minutes=time_minutes)
+    reminder_data = {
+        "channel_id": interaction.channel_id,
+        "user_id": interaction.user.id,
+        "user_name": interaction.user.name,
+        "message": message,
+        "due_at": due_at,
+        "sent": False,
+    }
 
     try:
-        await interaction.channel.send(f"{interaction.user.mention}", embed=embed)
+        await reminders_collection.insert_one(reminder_data)
     except Exception as e:
-        print(f'Error sending reminder: {e}')
+        print(f'Error saving reminder: {e}')
+        await interaction.response.send_message("An error occurred while saving the reminder.", ephemeral=True)
+        return
+
+    reminder_scheduler.add(due_at, reminder_data["_id"])
+    await interaction.response.send_message(f"✓ Reminder set! I'll remind you in {time_minutes} minute(s).", ephemeral=True)
 
 @bot.tree.command(name="manage", description="Manage team members", guild=discord.Object(id=serverid))
 @app_commands.describe(
@@ -903,56 +2886,69 @@ async def reminder(interaction: discord.Interaction, message: str, time_minutes:
 ])
 async def manage(interaction: discord.Interaction,action: app_commands.Choice[str],team_name: str,member1: discord.Member,member2: discord.Member | None = None,member3: discord.Member | None = None,member4: discord.Member | None = None,member5: discord.Member | None = None):
     await interaction.response.defer(ephemeral=True)
-    members = [m for m in (member1, member2, member3, member4, member5) if m]
+    members = list({m.id: m for m in (member1, member2, member3, member4, member5) if m}.values())
     has_permission = await check_permission(interaction)
 
     if not has_permission:
-        await interaction.response.send_message("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
+        await interaction.followup.send("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
         return
 
     action_value = action.value
 
     try:
-        team_exists = await roles_collection.find_one({"name": team_name})
+        team_exists = await team_registry.get(team_name)
         if not team_exists:
             await interaction.followup.send(f'Team "{team_name}" does not exist. Create it first with `/createteam`.', ephemeral=True)
             return
 
         if action_value == "add":
-            for member in members:
-                existing = await team_members_collection.find_one({
-                    "team_name": team_name,
-                    "discord_id": str(member.id)
-                })
-
-                if existing:
-                    await interaction.followup.send(f'{member.mention} is already in team "{team_name}".', ephemeral=True)
-                    return
-
-                member_data = {
+            member_docs = [
+                {
                     "team_name": team_name,
                     "discord_id": str(member.id),
                     "discord_username": member.name,
                     "discord_display_name": member.display_name
                 }
-
-                await team_members_collection.insert_one(member_data)
-                await interaction.followup.send(f'✓ Added {member.mention} to team "{team_name}" in database. Use `/setup action:roles` to assign Discord roles.', ephemeral=True)  
+                for member in members
+            ]
+            already_in = []
+            try:
+                await team_members_collection.insert_many(member_docs, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    already_in.append(members[error["index"]])
+
+            added = [member for member in members if member not in already_in]
+            lines = []
+            if added:
+                lines.append(f'✓ Added {", ".join(m.mention for m in added)} to team "{team_name}" in database. Use `/setup action:roles` to assign Discord roles.')
+            if already_in:
+                lines.append(f'{", ".join(m.mention for m in already_in)} already in team "{team_name}".')
+            await interaction.followup.send("\n".join(lines), ephemeral=True)
         else:
-            for member in members:
-                result = await team_members_collection.delete_one({
-                    "team_name": team_name,
-                    "discord_id": str(member.id)
-                })
-                if result.deleted_count > 0:
-                    for role in member.roles:
-                        if role.name==team_name:
-                            await member.remove_roles(role)
-                            break
-                    await interaction.followup.send(f'✓ Removed {member.mention} from team "{team_name}".', ephemeral=True)
-                else:
-                    await interaction.followup.send(f'{member.mention} is not in team "{team_name}".', ephemeral=True)
-
+            ids = [str(member.id) for member in members]
+            existing_ids = {
+                doc["discord_id"]
+                async for doc in team_members_collection.find({"team_name": team_name, "discord_id": {"$in": ids}}, {"discord_id": 1})
+            }
+            if existing_ids:
+                await team_members_collection.delete_many({"team_name": team_name, "discord_id": {"$in": list(existing_ids)}})
+
+            removed = [member for member in members if str(member.id) in existing_ids]
+            not_in = [member for member in members if str(member.id) not in existing_ids]
+            for member in removed:
+                role = discord.utils.get(member.roles, name=team_name)
+                if role:
+                    await member.remove_roles(role)
+
+            lines = []
+            if removed:
+                lines.append(f'✓ Removed {", ".join(m.mention for m in removed)} from team "{team_name}".')
+            if not_in:
+                lines.append(f'{", ".join(m.mention for m in not_in)} not in team "{team_name}".')
+            await interaction.followup.send("\n".join(lines), ephemeral=True)
 
     except Exception as e:
         print(f'Error managing team member: {e}')
@@ -991,6 +2987,18 @@ async def help_command(interaction: discord.Interaction):
         inline=False
     )
     
+    embed.add_field(
+        name="/importteams",
+        value="Bulk import teams and members from a CSV/JSON file\n`file` `create_roles`",
+        inline=False
+    )
+
+    embed.add_field(
+        name="/export",
+        value="Export teams, members and late-commit counts\n`export_format: csv/ndjson`",
+        inline=False
+    )
+    
     embed.add_field(
         name="/teaminfo",
         value="View team information\n`view: specific/all/members` `team_name`",
@@ -1021,6 +3029,12 @@ async def help_command(interaction: discord.Interaction):
         inline=False
     )
     
+    embed.add_field(
+        name="/stats",
+        value="Show command latency, API call and cache statistics",
+        inline=False
+    )
+    
     embed.add_field(
         name="/poll",
         value="Create a poll with options\n`question` `options`",
@@ -1048,7 +3062,7 @@ async def deleteteam(interaction: discord.Interaction, team_name: str):
         await interaction.response.send_message("You do not have permission to use this command. Only CT25/CT26 admins can use this.", ephemeral=True)
         return
         
-    team_exists = await roles_collection.find_one({"name": team_name})
+    team_exists = await team_registry.get(team_name)
     if not team_exists:
             await interaction.response.send_message(f'Team "{team_name}" does not exist. Create it first with `/createteam`.', ephemeral=True)
             return
@@ -1059,7 +3073,9 @@ async def deleteteam(interaction: discord.Interaction, team_name: str):
 
     try:
         await roles_collection.delete_one({"name": team_name})
+        team_registry.remove(team_name)
         await team_members_collection.delete_many({"team_name": team_name})
+        await forget_commits(team_name)
         
         role = discord.utils.get(guild.roles, name=team_name)
         if role:
@@ -1079,6 +3095,22 @@ async def deleteteam(interaction: discord.Interaction, team_name: str):
         print(f'Error deleting team: {e}')
         await interaction.followup.send(f"An error occurred: {e}")
 
+async def main():
+    discord.utils.setup_logging()
+    webhook_runner = await start_webhook_server()
+    metrics_runner = await start_metrics_server()
+    try:
+        async with bot:
+            await bot.start(TOKEN)
+    finally:
+        await config_store.flush()
+        await poll_engine.flush()
+        if webhook_runner:
+            await webhook_runner.cleanup()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await github.close()
+
 if __name__ == '__main__':
-    bot.run(TOKEN)
+    asyncio.run(main())
 
@@ -0,0 +1,43 @@
+import argparse
+import hashlib
+import hmac
+import json
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+parser = argparse.ArgumentParser(description="Send a signed fake GitHub push webhook to the bot")
+parser.add_argument("--url", default="http://127.0.0.1:8080/github/webhook")
+parser.add_argument("--secret", required=True, help="Same value as webhook_secret in .env")
+parser.add_argument("--repo", required=True, help="owner/repo, as saved with /addrepo")
+parser.add_argument("--branch", default="main")
+parser.add_argument("--message", default="Fake commit from fake_webhook.py")
+parser.add_argument("--timestamp", default=None, help="ISO 8601 commit time (default: now)")
+args = parser.parse_args()
+
+timestamp = args.timestamp or datetime.now(timezone.utc).isoformat()
+sha = uuid.uuid4().hex + uuid.uuid4().hex[:8]
+commit = {"id": sha, "message": args.message, "timestamp": timestamp}
+payload = {
+    "ref": f"refs/heads/{args.branch}",
+    "after": sha,
+    "repository": {"full_name": args.repo, "default_branch": args.branch},
+    "commits": [commit],
+    "head_commit": commit,
+}
+
+body = json.dumps(payload).encode()
+signature = "sha256=" + hmac.new(args.secret.encode(), body, hashlib.sha256).hexdigest()
+request = urllib.request.Request(args.url, data=body, method="POST", headers={
+    "Content-Type": "application/json",
+    "X-GitHub-Event": "push",
+    "X-GitHub-Delivery": str(uuid.uuid4()),
+    "X-Hub-Signature-256": signature,
+})
+
+try:
+    with urllib.request.urlopen(request) as response:
+        print(response.status, response.read().decode())
+except urllib.error.HTTPError as e:
+    print(e.code, e.read().decode())